@@ -0,0 +1,257 @@
+# analyze.py — whole-capture analytics (SNR, EVM, per-scheme BER, constellation density)
+#
+#   python analyze.py rx_capture.iqcap                     # -> rx_capture.iqcap.analysis/
+#   python analyze.py rx_capture.iqcap --workers 8 --chunk-mb 64 --out results/
+#
+# The capture (capture.py) is split into chunks of whole frames. Each chunk is
+# handled by a pool process that memory-maps the capture itself, groups the
+# frames by (scheme, length) into 2-D arrays and computes every metric with
+# array ops (the only per-frame step is regenerating the reference PRBS).
+# Chunks return fixed-size partial aggregates (histograms + sums), merged
+# here in capture order, so memory stays the same for a thousand frames or
+# a billion.
+#
+# Written to the output directory while the run progresses:
+#   summary.json          per-scheme totals/percentiles (rewritten atomically)
+#   density_<scheme>.npy  DENSITY_BINS x DENSITY_BINS I/Q histogram (counts)
+#   frames.bin            one FRAME_DTYPE record per frame, capture order
+#                         (np.fromfile(path, FRAME_DTYPE))
+#
+# Two SNRs per frame: snr_db is rx.py's estimate_snr_from_cloud (power over
+# spread around the cloud median, which reads low for multi-point
+# constellations), snr_evm_db is -20*log10(EVM) from hard decisions.
+# BER is measured: each frame's payload is the PRBS common.frame_bits(frame_id,
+# nbits), so it is regenerated and compared with the hard-decision bits.
+import argparse, json, os, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from capture import Capture, SCHEME_NAMES
+from common import frame_bits
+
+SNR_EDGES = np.arange(-20.0, 60.0 + 0.1, 0.1)      # dB
+EVM_EDGES = np.arange(0.0, 200.0 + 0.1, 0.1)       # % rms
+DENSITY_BINS = 256
+DENSITY_RANGE = 2.0                                # I/Q span [-2, 2]
+FRAME_DTYPE = np.dtype([("frame_id", "<u4"), ("scheme_id", "u1"), ("t_rx", "<f8"), ("snr_db", "<f4"),
+                        ("snr_evm_db", "<f4"), ("evm_pct", "<f4"), ("ber", "<f4")])
+
+# -------------------- Vectorized metrics (frames x symbols) --------------------
+def snr_db_batch(I: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    # row-wise rx.estimate_snr_from_cloud
+    pwr = np.mean(I*I + Q*Q, axis=1)
+    mi = np.median(I, axis=1, keepdims=True)
+    mq = np.median(Q, axis=1, keepdims=True)
+    var = np.mean((I - mi)**2 + (Q - mq)**2, axis=1) + 1e-9
+    return 10*np.log10(np.maximum(pwr/var, 1e-9))
+
+def slice_ideal(I: np.ndarray, Q: np.ndarray, scheme_id: int):
+    # nearest constellation point (hard decision) for the common.py mappers
+    if scheme_id == 1:
+        return np.where(I < 0, -1.0, 1.0), np.zeros_like(Q)
+    if scheme_id == 2:
+        a = 1/np.sqrt(2)
+        return np.where(I < 0, -a, a), np.where(Q < 0, -a, a)
+    s = np.sqrt(10)
+    level = lambda x: np.clip(2*np.floor(x*s/2) + 1, -3, 3) / s
+    return level(I), level(Q)
+
+def density(I: np.ndarray, Q: np.ndarray) -> np.ndarray:
+    # 2-D I/Q histogram via one bincount (histogram2d is several times slower)
+    scale = DENSITY_BINS / (2*DENSITY_RANGE)
+    ix = np.floor((I.ravel() + DENSITY_RANGE) * scale).astype(np.int64)
+    iy = np.floor((Q.ravel() + DENSITY_RANGE) * scale).astype(np.int64)
+    keep = (ix >= 0) & (ix < DENSITY_BINS) & (iy >= 0) & (iy < DENSITY_BINS)
+    flat = np.bincount(ix[keep]*DENSITY_BINS + iy[keep], minlength=DENSITY_BINS*DENSITY_BINS)
+    return flat.reshape(DENSITY_BINS, DENSITY_BINS)
+
+def hard_bits(I: np.ndarray, Q: np.ndarray, scheme_id: int) -> np.ndarray:
+    # row-wise common.py demodulators -> (frames, n_sym * bits/symbol) uint8
+    if scheme_id == 1:
+        return (I < 0).astype(np.uint8)
+    if scheme_id == 2:
+        return np.stack([I < 0, Q < 0], axis=-1).reshape(len(I), -1).astype(np.uint8)
+    # 16QAM Gray pairs per axis: -3 -> 00, -1 -> 01, +1 -> 11, +3 -> 10
+    x, y = I*np.sqrt(10), Q*np.sqrt(10)
+    return np.stack([x >= 0, np.abs(x) < 2, y >= 0, np.abs(y) < 2], axis=-1).reshape(len(I), -1).astype(np.uint8)
+
+def bit_errors(rx_bits: np.ndarray, frame_ids: np.ndarray, nbits: np.ndarray) -> np.ndarray:
+    # errors per frame against the regenerated payload; bits the frame did
+    # not carry (nbits beyond the symbols) count as errors
+    out = np.empty(len(rx_bits), np.int64)
+    for k, (fid, nb) in enumerate(zip(frame_ids, nbits)):
+        n = min(int(nb), rx_bits.shape[1])
+        out[k] = np.count_nonzero(frame_bits(int(fid), n) != rx_bits[k, :n]) + int(nb) - n
+    return out
+
+# -------------------- Per-chunk work (pool processes) --------------------
+_cap = None
+
+def _capture(path: str) -> Capture:
+    # one memory map per worker process, reused across chunks
+    global _cap
+    if _cap is None or _cap.path != path:
+        _cap = Capture(path)
+    return _cap
+
+def _empty_partial():
+    return {"frames": 0, "symbols": 0, "bits": 0, "bit_errors": 0, "err_pow": 0.0, "ref_pow": 0.0,
+            "snr_hist": np.zeros(len(SNR_EDGES) - 1, np.int64),
+            "snr_evm_hist": np.zeros(len(SNR_EDGES) - 1, np.int64),
+            "evm_hist": np.zeros(len(EVM_EDGES) - 1, np.int64),
+            "density": np.zeros((DENSITY_BINS, DENSITY_BINS), np.int64),
+            "t_first": None, "t_last": None}
+
+def analyze_chunk(path: str, lo: int, hi: int):
+    cap = _capture(path)
+    idx = cap.index[lo:hi]
+    per_frame = np.zeros(hi - lo, FRAME_DTYPE)
+    per_frame["frame_id"] = idx["frame_id"]
+    per_frame["scheme_id"] = idx["scheme_id"]
+    per_frame["t_rx"] = idx["t_rx"]
+    partial = {}
+
+    for sid in np.unique(idx["scheme_id"]):
+        sid = int(sid)
+        if sid not in SCHEME_NAMES:
+            continue
+        for n_sym in np.unique(idx["n_sym"][idx["scheme_id"] == sid]):
+            rows = np.nonzero((idx["scheme_id"] == sid) & (idx["n_sym"] == n_sym))[0]
+            if n_sym == 0:
+                continue
+            iq = np.stack([cap.iq(lo + int(r)) for r in rows])      # (frames, n_sym, 2)
+            I, Q = iq[..., 0].astype(np.float64), iq[..., 1].astype(np.float64)
+
+            snr = snr_db_batch(I, Q)
+            sI, sQ = slice_ideal(I, Q, sid)
+            err = np.sum((I - sI)**2 + (Q - sQ)**2, axis=1)
+            ref = np.sum(sI*sI + sQ*sQ, axis=1)
+            evm = 100*np.sqrt(err / np.maximum(ref, 1e-12))
+            snr_evm = -20*np.log10(np.maximum(evm, 1e-6) / 100)
+            nbits = idx["nbits"][rows].astype(np.int64)
+            errors = bit_errors(hard_bits(I, Q, sid), idx["frame_id"][rows], nbits)
+
+            per_frame["snr_db"][rows] = snr
+            per_frame["snr_evm_db"][rows] = snr_evm
+            per_frame["evm_pct"][rows] = evm
+            per_frame["ber"][rows] = errors / np.maximum(nbits, 1)
+
+            p = partial.setdefault(SCHEME_NAMES[sid], _empty_partial())
+            p["frames"] += len(rows)
+            p["symbols"] += len(rows) * int(n_sym)
+            p["bits"] += int(nbits.sum())
+            p["bit_errors"] += int(errors.sum())
+            p["err_pow"] += float(err.sum())
+            p["ref_pow"] += float(ref.sum())
+            p["snr_hist"] += np.histogram(np.clip(snr, SNR_EDGES[0], SNR_EDGES[-1]), SNR_EDGES)[0]
+            p["snr_evm_hist"] += np.histogram(np.clip(snr_evm, SNR_EDGES[0], SNR_EDGES[-1]), SNR_EDGES)[0]
+            p["evm_hist"] += np.histogram(np.clip(evm, EVM_EDGES[0], EVM_EDGES[-1]), EVM_EDGES)[0]
+            p["density"] += density(I, Q)
+            t = idx["t_rx"][rows]
+            p["t_first"] = float(t.min()) if p["t_first"] is None else min(p["t_first"], float(t.min()))
+            p["t_last"] = float(t.max()) if p["t_last"] is None else max(p["t_last"], float(t.max()))
+    return hi - lo, partial, per_frame
+
+# -------------------- Merge + output (main process) --------------------
+def merge(total: dict, partial: dict):
+    for scheme, p in partial.items():
+        t = total.setdefault(scheme, _empty_partial())
+        for k in ("frames", "symbols", "bits", "bit_errors", "err_pow", "ref_pow",
+                  "snr_hist", "snr_evm_hist", "evm_hist", "density"):
+            t[k] += p[k]
+        t["t_first"] = p["t_first"] if t["t_first"] is None else min(t["t_first"], p["t_first"])
+        t["t_last"] = p["t_last"] if t["t_last"] is None else max(t["t_last"], p["t_last"])
+
+def hist_percentiles(hist: np.ndarray, edges: np.ndarray, qs=(5, 50, 95)):
+    n = hist.sum()
+    if n == 0:
+        return {f"p{q}": None for q in qs}
+    cdf = np.cumsum(hist) / n
+    centers = (edges[:-1] + edges[1:]) / 2
+    return {f"p{q}": round(float(centers[np.searchsorted(cdf, q/100)]), 2) for q in qs}
+
+def hist_mean(hist: np.ndarray, edges: np.ndarray):
+    n = hist.sum()
+    return round(float(np.dot(hist, (edges[:-1] + edges[1:]) / 2) / n), 3) if n else None
+
+def write_outputs(out_dir, path, total, done, n_frames, started):
+    summary = {"capture": os.path.abspath(path), "frames_done": done, "frames_total": n_frames,
+               "complete": done == n_frames, "elapsed_s": round(time.perf_counter() - started, 2),
+               "schemes": {}}
+    for scheme, t in total.items():
+        np.save(os.path.join(out_dir, f"density_{scheme}.npy"), t["density"])
+        summary["schemes"][scheme] = {
+            "frames": t["frames"], "symbols": t["symbols"], "bits": t["bits"], "bit_errors": t["bit_errors"],
+            "t_first": t["t_first"], "t_last": t["t_last"],
+            "snr_db": {"mean": hist_mean(t["snr_hist"], SNR_EDGES), **hist_percentiles(t["snr_hist"], SNR_EDGES)},
+            "snr_evm_db": {"mean": hist_mean(t["snr_evm_hist"], SNR_EDGES),
+                           **hist_percentiles(t["snr_evm_hist"], SNR_EDGES)},
+            # rms over all symbols, plus the spread of per-frame values
+            "evm_pct": {"rms": round(100*float(np.sqrt(t["err_pow"] / max(t["ref_pow"], 1e-12))), 3),
+                        **hist_percentiles(t["evm_hist"], EVM_EDGES)},
+            "ber": t["bit_errors"] / t["bits"] if t["bits"] else None,
+            "density": {"file": f"density_{scheme}.npy", "bins": DENSITY_BINS,
+                        "range": [-DENSITY_RANGE, DENSITY_RANGE]},
+        }
+    tmp = os.path.join(out_dir, "summary.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "summary.json"))
+    return summary
+
+def main():
+    p = argparse.ArgumentParser(description="Batch analytics over an IQ capture")
+    p.add_argument("path")
+    p.add_argument("--out", default=None, help="output directory (default: <capture>.analysis)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--chunk-mb", type=float, default=32.0, help="I/Q bytes per chunk")
+    p.add_argument("--write-every", type=float, default=2.0, help="seconds between summary rewrites")
+    args = p.parse_args()
+
+    cap = Capture(args.path)
+    n = len(cap)
+    if n == 0:
+        raise SystemExit(f"{args.path}: empty capture")
+    out_dir = args.out or args.path + ".analysis"
+    os.makedirs(out_dir, exist_ok=True)
+
+    # chunk boundaries by I/Q bytes, so long and short frames make similar work units
+    sizes = cap.index["n_sym"].astype(np.int64) * 8
+    cum = np.cumsum(sizes)
+    bounds = np.searchsorted(cum, np.arange(args.chunk_mb*2**20, cum[-1], args.chunk_mb*2**20), side="right")
+    bounds = [0, *sorted(set(int(b) for b in bounds if 0 < b < n)), n]
+    chunks = list(zip(bounds[:-1], bounds[1:]))
+    del cap
+
+    print(f"[Analyze] {args.path}: {n} frames in {len(chunks)} chunks, {args.workers} workers -> {out_dir}")
+    started = time.perf_counter()
+    total, done, last_write = {}, 0, 0.0
+    with ProcessPoolExecutor(args.workers) as pool, open(os.path.join(out_dir, "frames.bin"), "wb") as frames_out:
+        pending = deque()
+        todo = iter(chunks)
+        # keep a bounded number of chunks in flight; consume in capture order
+        for lo, hi in todo:
+            pending.append(pool.submit(analyze_chunk, args.path, lo, hi))
+            if len(pending) >= 2*args.workers:
+                break
+        while pending:
+            count, partial, per_frame = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(analyze_chunk, args.path, *nxt))
+            merge(total, partial)
+            per_frame.tofile(frames_out)
+            done += count
+            if time.perf_counter() - last_write > args.write_every or not pending:
+                frames_out.flush()
+                write_outputs(out_dir, args.path, total, done, n, started)
+                last_write = time.perf_counter()
+                print(f"[Analyze] {done}/{n} frames  {done/(last_write - started):.0f} frames/s")
+
+    summary = write_outputs(out_dir, args.path, total, done, n, started)
+    for scheme, s in summary["schemes"].items():
+        print(f"  {scheme:<6} frames={s['frames']:>9}  snr(evm) p50={s['snr_evm_db']['p50']} dB  "
+              f"evm={s['evm_pct']['rms']:.2f}%  ber={s['ber']:.2e}")
+
+if __name__ == "__main__":
+    main()
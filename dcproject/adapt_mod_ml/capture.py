@@ -0,0 +1,180 @@
+# capture.py — append-only IQ capture files for offline replay/analysis
+#
+# <name>            data file
+#   b"DCIQCAP1"     magic (8 bytes)
+#   records...      "<Id3x" (datagram length, receive time) + the raw UDP
+#                   datagram ("!IBI" header + float32 I/Q pairs), zero-padded
+#                   to 8 bytes so every I/Q payload is 8-byte aligned
+# <name>.idx        index, one IDX_DTYPE entry per record (same order)
+#
+# Both files are only ever appended to. The index is a convenience for
+# memory-mapping (frame i without scanning); if it is missing or shorter than
+# the data file (crash mid-write) it is rebuilt from the data file on open.
+#
+#   python capture.py info rx_capture.iqcap
+#   python capture.py rebuild-index rx_capture.iqcap
+import os, struct, sys
+import numpy as np
+
+MAGIC = b"DCIQCAP1"
+REC = struct.Struct("<Id3x")          # 15 bytes; + 9-byte frame header = 24
+HDR = struct.Struct("!IBI")           # frame_id, scheme_id, nbits (as sent by tx.py)
+IQ_OFFSET = REC.size + HDR.size       # record start -> first I/Q float
+IDX_DTYPE = np.dtype([
+    ("offset", "<u8"),                # record start in the data file
+    ("t_rx", "<f8"),                  # time.time() when the datagram was received
+    ("frame_id", "<u4"),
+    ("nbits", "<u4"),
+    ("n_sym", "<u4"),
+    ("scheme_id", "u1"),
+    ("_pad", "V3"),
+])
+_IDX = struct.Struct("<QdIIIB3x")
+assert _IDX.size == IDX_DTYPE.itemsize == 32
+SCHEME_NAMES = {1: "BPSK", 2: "QPSK", 3: "16QAM"}
+
+def _padded(n: int) -> int:
+    return (n + 7) & ~7
+
+# -------------------- Writing --------------------
+class CaptureWriter:
+    # Buffered appends from the receive thread: one struct.pack + two
+    # buffered writes per frame, flushed to disk every `flush_every` frames.
+    def __init__(self, path: str, flush_every: int = 256, buffer_bytes: int = 1 << 20):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            rebuild_index(path, only_if_stale=True)
+        self._data = open(path, "ab", buffering=buffer_bytes)
+        self._idx = open(path + ".idx", "ab", buffering=buffer_bytes // 16)
+        if new:
+            self._data.write(MAGIC)
+        self._pos = self._data.tell()
+        self._n = 0
+        self.flush_every = flush_every
+
+    def append(self, datagram: bytes, t_rx: float):
+        if len(datagram) < HDR.size or (len(datagram) - HDR.size) % 8:
+            # not a frame: the index stores whole I/Q pairs (n_sym) and
+            # readers locate the next record from that, not from REC's length
+            return
+        frame_id, scheme_id, nbits = HDR.unpack_from(datagram)
+        n = len(datagram)
+        self._data.write(REC.pack(n, t_rx))
+        self._data.write(datagram)
+        pad = _padded(REC.size + n) - (REC.size + n)
+        if pad:
+            self._data.write(b"\0" * pad)
+        self._idx.write(_IDX.pack(self._pos, t_rx, frame_id, nbits, (n - HDR.size) // 8, scheme_id))
+        self._pos += REC.size + n + pad
+        self._n += 1
+        if self._n % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        # data before index, so an index entry never points past the data
+        self._data.flush()
+        self._idx.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# -------------------- Reading --------------------
+def _scan(path: str):
+    # walk the record chain of the data file -> list of index tuples
+    entries = []
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not an IQ capture file")
+        size = os.fstat(f.fileno()).st_size
+        pos = len(MAGIC)
+        while pos + IQ_OFFSET <= size:
+            f.seek(pos)
+            n, t_rx = REC.unpack(f.read(REC.size))
+            if pos + REC.size + n > size:
+                break  # truncated last record
+            frame_id, scheme_id, nbits = HDR.unpack(f.read(HDR.size))
+            entries.append((pos, t_rx, frame_id, nbits, (n - HDR.size) // 8, scheme_id))
+            pos += _padded(REC.size + n)
+    return entries
+
+def rebuild_index(path: str, only_if_stale: bool = False) -> int:
+    idx_path = path + ".idx"
+    if only_if_stale and os.path.exists(idx_path):
+        # stale = the data file holds more than the index covers
+        n_idx = os.path.getsize(idx_path) // IDX_DTYPE.itemsize
+        end = len(MAGIC)
+        if n_idx:
+            last = np.memmap(idx_path, IDX_DTYPE, "r", shape=(n_idx,))[-1]
+            end = int(last["offset"]) + _padded(IQ_OFFSET + 8*int(last["n_sym"]))
+        if end >= os.path.getsize(path) and os.path.getsize(idx_path) % IDX_DTYPE.itemsize == 0:
+            return n_idx
+    entries = _scan(path)
+    with open(idx_path, "wb") as f:
+        for e in entries:
+            f.write(_IDX.pack(*e))
+    # drop a torn trailing record so new appends start on a record boundary
+    end = entries[-1][0] + _padded(IQ_OFFSET + 8*entries[-1][4]) if entries else len(MAGIC)
+    if os.path.getsize(path) > end:
+        os.truncate(path, end)
+    return len(entries)
+
+class Capture:
+    # Read-only, memory-mapped view of a capture. Nothing is loaded up front;
+    # iq(i) is a zero-copy (n_sym, 2) float32 view into the page cache.
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path + ".idx"):
+            rebuild_index(path)
+        self.data = np.memmap(path, np.uint8, "r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path}: not an IQ capture file")
+        n = os.path.getsize(path + ".idx") // IDX_DTYPE.itemsize
+        index = np.memmap(path + ".idx", IDX_DTYPE, "r", shape=(n,)) if n else np.zeros(0, IDX_DTYPE)
+        # a writer may still be appending: only expose records fully on disk
+        end = index["offset"] + IQ_OFFSET + 8*index["n_sym"].astype(np.uint64)
+        self.index = index[:int(np.searchsorted(end, len(self.data), side="right"))]
+
+    def __len__(self):
+        return len(self.index)
+
+    def datagram(self, i: int) -> memoryview:
+        # the original UDP payload, byte for byte
+        e = self.index[i]
+        start = int(e["offset"]) + REC.size
+        return memoryview(self.data[start:start + HDR.size + 8*int(e["n_sym"])])
+
+    def iq(self, i: int) -> np.ndarray:
+        e = self.index[i]
+        start = int(e["offset"]) + IQ_OFFSET
+        return self.data[start:start + 8*int(e["n_sym"])].view(np.float32).reshape(-1, 2)
+
+    def duration(self) -> float:
+        return float(self.index["t_rx"][-1] - self.index["t_rx"][0]) if len(self) > 1 else 0.0
+
+def info(path: str):
+    cap = Capture(path)
+    idx = cap.index
+    print(f"{path}: {len(cap)} frames, {os.path.getsize(path)/1e6:.1f} MB, {cap.duration():.1f} s")
+    if len(cap):
+        print(f"  frame_id {int(idx['frame_id'][0])}..{int(idx['frame_id'][-1])}")
+        for sid, name in SCHEME_NAMES.items():
+            m = idx["scheme_id"] == sid
+            if m.any():
+                print(f"  {name:<6} {int(m.sum()):>9} frames  {int(idx['n_sym'][m].sum()):>12} symbols")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("info", "rebuild-index"):
+        sys.exit("usage: python capture.py {info|rebuild-index} <capture file>")
+    if sys.argv[1] == "info":
+        info(sys.argv[2])
+    else:
+        print(f"{rebuild_index(sys.argv[2])} records indexed")
@@ -1,5 +1,5 @@
 import numpy as np
-import socket
+import socket, struct
 
 # -------------------- Modulation / Demodulation --------------------
 # Symbols normalized to Es≈1 for fairness
@@ -13,7 +13,7 @@ def bpsk_demod(sym: np.ndarray) -> np.ndarray:
 def qpsk_mod(bits: np.ndarray) -> np.ndarray:
     if len(bits) % 2 != 0:
         bits = np.append(bits, 0)
-    b = bits.reshape(-1, 2)
+    b = bits.reshape(-1, 2).astype(np.float64)   # uint8 would wrap at 1 - 2*1
     i = (1 - 2*b[:,0])
     q = (1 - 2*b[:,1])
     return ((i + 1j*q) / np.sqrt(2)).astype(np.complex128)
@@ -78,6 +78,25 @@ def unpack_bytes_to_bits(b: bytes, nbits: int) -> np.ndarray:
     bits = np.unpackbits(arr)
     return bits[:nbits].astype(np.uint8)
 
+# -------------------- Frame payload --------------------
+def frame_bits(frame_id: int, nbits: int) -> np.ndarray:
+    # PRBS payload seeded by the frame id: RX regenerates it to measure the real BER
+    return np.random.default_rng(frame_id).integers(0, 2, size=nbits, dtype=np.uint8)
+
+# -------------------- Feedback (RX -> TX, port 6001) --------------------
+# link summary, then (frame_id, measured BER) for frames received since the last packet
+FEEDBACK = struct.Struct("!ffff")     # snr_db, delay_ms, jitter_ms, recent_ber
+OUTCOME = struct.Struct("!If")        # frame_id, ber
+MAX_OUTCOMES = 128                    # per feedback datagram
+
+def pack_feedback(snr_db, delay_ms, jitter_ms, recent_ber, outcomes=()) -> bytes:
+    return FEEDBACK.pack(snr_db, delay_ms, jitter_ms, recent_ber) + b"".join(OUTCOME.pack(*o) for o in outcomes)
+
+def unpack_feedback(data: bytes):
+    # -> ((snr_db, delay_ms, jitter_ms, recent_ber), [(frame_id, ber), ...])
+    n = (len(data) - FEEDBACK.size) // OUTCOME.size
+    return FEEDBACK.unpack_from(data), list(OUTCOME.iter_unpack(data[FEEDBACK.size:FEEDBACK.size + n*OUTCOME.size]))
+
 # -------------------- Metrics --------------------
 def ber(ref_bits: np.ndarray, rx_bits: np.ndarray) -> float:
     n = min(len(ref_bits), len(rx_bits))
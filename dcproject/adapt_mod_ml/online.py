@@ -0,0 +1,212 @@
+# online.py — online retraining of the TX modulation policy from link logs
+#
+#   LinkLog     rotating binary log, one LOG_DTYPE record per sent frame:
+#               features at send time, scheme, policy version, and the BER
+#               RX measured for that frame (reported back by frame_id on
+#               port 6001)
+#   PolicySlot  holds the live model; tx.py reads it once per frame and a
+#               swap is one reference assignment, so the send loop never waits
+#   retrain()   relabels logged conditions by measured BER, fits a candidate
+#               (train_ml.new_pipeline on the train_ml.gen_data prior plus the
+#               log), validates it against the live policy on the newest
+#               records and hot-swaps it if it does better
+#
+# Goodput (bits/symbol of frames that met BER_TARGET) is recorded per policy
+# version in <log dir>/retrain_history.jsonl, i.e. throughput before/after
+# every swap. The log format and rules match adaptve_comm_py/app/online_learning.py.
+import glob, json, os, pickle, struct, threading, time
+from functools import lru_cache
+import numpy as np
+from train_ml import gen_data, new_pipeline, ber_bpsk_theory, ber_qpsk_theory, ber_16qam_theory
+
+SCHEMES = ["BPSK", "QPSK", "16QAM"]
+BITS_PER_SYMBOL = np.array([1, 2, 4])
+BER_TARGET = 1e-3             # same rule gen_data labels with
+
+LOG_DIR = "linklog"
+LOG_MAX_BYTES = 4 << 20       # per file before rotating
+LOG_KEEP = 8                  # files kept per writer; oldest are deleted
+LOG_FLUSH_EVERY = 64
+LOG_READ_FILES = 32           # newest files (any writer) read for retraining
+
+RETRAIN_INTERVAL = 60.0
+RETRAIN_MIN_RECORDS = 200
+RETRAIN_MARGIN = 0.01         # bits/symbol a candidate must gain to replace the live policy
+SNR_BIN_DB = 1.0
+MIN_BIN_SAMPLES = 5           # below this a (bin, scheme) cell falls back to theory
+SYNTHETIC_PRIOR = 2000        # gen_data samples mixed in to cover unseen conditions
+
+LOG_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("snr_db", "<f4"), ("delay_ms", "<f4"), ("jitter_ms", "<f4"), ("recent_ber", "<f4"),
+    ("ber", "<f4"), ("nbits", "<u4"), ("version", "<u2"), ("scheme", "u1"),
+])
+_REC = struct.Struct("<dfffffIHB")
+assert _REC.size == LOG_DTYPE.itemsize
+
+@lru_cache(maxsize=1)
+def _prior():
+    # built on first retrain; gen_data reseeds the global RNG (which
+    # common.add_awgn draws from), so its state is put back afterwards
+    state = np.random.get_state()
+    try:
+        return gen_data(SYNTHETIC_PRIOR)
+    finally:
+        np.random.set_state(state)
+
+# -------------------- Log --------------------
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+class LinkLog:
+    def __init__(self, dirpath: str = LOG_DIR, max_bytes: int = LOG_MAX_BYTES, keep: int = LOG_KEEP):
+        self.dir, self.max_bytes, self.keep = dirpath, max_bytes, keep
+        self._prefix = os.path.join(dirpath, f"link-{os.getpid()}-")
+        self._lock = threading.Lock()
+        self._seq, self._f, self._pending = 0, None, 0
+        os.makedirs(dirpath, exist_ok=True)
+
+    def record(self, snr_db, delay_ms, jitter_ms, recent_ber, scheme, ber, nbits, version=0, t=None):
+        rec = _REC.pack(time.time() if t is None else t, snr_db, delay_ms, jitter_ms, recent_ber,
+                        ber, nbits, version & 0xFFFF, SCHEMES.index(scheme))
+        with self._lock:
+            if self._f is None or self._f.tell() >= self.max_bytes:
+                if self._f:
+                    self._f.close()
+                self._seq += 1
+                self._f = open(f"{self._prefix}{self._seq:06d}.log", "ab")
+                for old in sorted(glob.glob(self._prefix + "*.log"))[:-self.keep]:
+                    os.remove(old)
+            self._f.write(rec)
+            self._pending += 1
+            if self._pending >= LOG_FLUSH_EVERY:
+                self._f.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._f:
+                self._f.close()
+                self._f = None
+
+    def read(self) -> np.ndarray:
+        # newest files of every writer, oldest record first
+        with self._lock:
+            if self._f:
+                self._f.flush()
+        parts = []
+        for path in sorted(glob.glob(os.path.join(self.dir, "link-*.log")), key=_mtime)[-LOG_READ_FILES:]:
+            try:
+                with open(path, "rb") as f:
+                    buf = f.read()
+            except FileNotFoundError:
+                continue  # rotated away meanwhile
+            parts.append(np.frombuffer(buf, LOG_DTYPE, count=len(buf) // LOG_DTYPE.itemsize))
+        rec = np.concatenate(parts) if parts else np.zeros(0, LOG_DTYPE)
+        return rec[np.argsort(rec["t"], kind="stable")]
+
+# -------------------- Live policy --------------------
+class ThresholdPolicy:
+    # tx.py's rule when there is no model.pkl, in model form
+    def predict(self, X):
+        X = np.asarray(X, float)
+        return np.where(X[:, 0] < 6, 0, np.where(X[:, 0] < 12, 1, 2))
+
+class PolicySlot:
+    def __init__(self, model, version: int = 0):
+        self._current = (version, model)
+        self._lock = threading.Lock()   # serializes swaps, never taken by readers
+
+    @property
+    def model(self):
+        return self._current[1]
+
+    def current(self):
+        # (version, model) as one consistent pair
+        return self._current
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def swap(self, model) -> int:
+        with self._lock:
+            version = self._current[0] + 1
+            self._current = (version, model)
+            return version
+
+# -------------------- Retraining --------------------
+def _features(rec):
+    return np.column_stack([rec["snr_db"], rec["delay_ms"], rec["jitter_ms"], rec["recent_ber"]]).astype(float)
+
+def _outcome_table(rec):
+    # bit-weighted measured BER per (SNR bin, scheme), theory where unobserved
+    theory = (ber_bpsk_theory, ber_qpsk_theory, ber_16qam_theory)
+    bins = np.floor(rec["snr_db"] / SNR_BIN_DB).astype(int)
+    lo = bins.min()
+    shape = (bins.max() - lo + 1, len(SCHEMES))
+    err, nb, n = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    w = rec["nbits"].astype(float)
+    np.add.at(err, (bins - lo, rec["scheme"]), rec["ber"] * w)
+    np.add.at(nb, (bins - lo, rec["scheme"]), w)
+    np.add.at(n, (bins - lo, rec["scheme"]), 1)
+    table = err / np.maximum(nb, 1)
+    for b, s in zip(*np.nonzero(n < MIN_BIN_SAMPLES)):
+        table[b, s] = theory[s]((lo + b + 0.5) * SNR_BIN_DB)
+    return lo, table
+
+def _ber_at(snr_db, lo, table):
+    return table[np.clip(np.floor(snr_db / SNR_BIN_DB).astype(int) - lo, 0, len(table) - 1)]
+
+def _goodput(model, X, lo, table):
+    choice = np.asarray(model.predict(X)).astype(int)
+    ber = _ber_at(X[:, 0], lo, table)[np.arange(len(X)), choice]
+    return float(np.mean(np.where(ber < BER_TARGET, BITS_PER_SYMBOL[choice], 0)))
+
+def retrain(log: LinkLog, slot: PolicySlot, model_path: str = None) -> dict:
+    rec = log.read()
+    entry = {"t": time.time(), "records": len(rec), "version": slot.version}
+    if len(rec) < RETRAIN_MIN_RECORDS:
+        entry["skipped"] = f"fewer than {RETRAIN_MIN_RECORDS} records"
+        return entry
+    lo, table = _outcome_table(rec)
+    X = _features(rec)
+    ok = _ber_at(X[:, 0], lo, table) < BER_TARGET
+    y = np.where(ok[:, 2], 2, np.where(ok[:, 1], 1, 0))
+    split = int(len(rec) * 0.75)     # validate on the newest quarter
+    Xs, ys = _prior()
+    candidate = new_pipeline().fit(np.vstack([Xs, X[:split]]), np.concatenate([ys, y[:split]]))
+
+    live = slot.model
+    entry["val_goodput_live"] = _goodput(live, X[split:], lo, table)
+    entry["val_goodput_candidate"] = _goodput(candidate, X[split:], lo, table)
+    entry["live_goodput_by_version"] = {
+        int(v): round(float(np.mean(np.where(rec["ber"][m] < BER_TARGET, BITS_PER_SYMBOL[rec["scheme"][m]], 0))), 4)
+        for v in np.unique(rec["version"]) for m in [rec["version"] == v]}
+    entry["swapped"] = entry["val_goodput_candidate"] >= entry["val_goodput_live"] + RETRAIN_MARGIN
+    if entry["swapped"]:
+        if model_path:
+            tmp = f"{model_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(candidate, f)
+            os.replace(tmp, model_path)   # next tx.py start picks it up
+        entry["new_version"] = slot.swap(candidate)
+    with open(os.path.join(log.dir, "retrain_history.jsonl"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+def retrain_loop(log: LinkLog, slot: PolicySlot, model_path: str = None, interval: float = RETRAIN_INTERVAL):
+    # body of tx.py's background thread; model_path=None keeps swaps in memory only
+    while True:
+        time.sleep(interval)
+        try:
+            e = retrain(log, slot, model_path)
+        except Exception as exc:
+            print(f"[TX] retrain failed: {exc!r}")
+            continue
+        if e.get("swapped"):
+            print(f"[TX] policy v{e['version']} -> v{e['new_version']}  "
+                  f"(validation goodput {e['val_goodput_live']:.2f} -> {e['val_goodput_candidate']:.2f} bits/sym)")
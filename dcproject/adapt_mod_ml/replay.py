@@ -0,0 +1,83 @@
+# replay.py — re-inject a recorded capture (capture.py) for reproducible tests
+#
+#   python replay.py rx_capture.iqcap                      # UDP to rx.py, original timing
+#   python replay.py rx_capture.iqcap --speed 0            # UDP, as fast as possible
+#   python replay.py rx_capture.iqcap --mode demod --speed 0 --loops 5
+#
+# udp    sends each datagram byte-for-byte to RX_DATA_PORT (rx.py / rx_gui.py
+#        or relay.py in between), so the receivers see exactly what was captured
+# demod  skips the network and runs the receive path in-process:
+#        SNR estimate + demodulation of every frame, reporting frames/s
+#
+# --speed 1 keeps the recorded inter-arrival times, 2 plays twice as fast,
+# 0 sends back-to-back. Frames come from a read-only memory map, so a replay
+# never loads the whole capture into memory.
+import argparse, socket, time
+from common import MOD_SCHEMES
+from capture import Capture, SCHEME_NAMES
+from rx import estimate_snr_from_cloud, RX_DATA_PORT
+
+def paced(cap: Capture, lo: int, hi: int, speed: float, stats: dict):
+    # yield frame indices, sleeping to reproduce the recorded timing
+    t_rec = cap.index["t_rx"]
+    t0_rec, t0 = float(t_rec[lo]), time.perf_counter()
+    for i in range(lo, hi):
+        if speed > 0:
+            due = t0 + (float(t_rec[i]) - t0_rec) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                stats["late_ms"] = max(stats["late_ms"], -delay*1e3)
+        yield i
+
+def replay_udp(cap, lo, hi, args, stats):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i in paced(cap, lo, hi, args.speed, stats):
+        s.sendto(cap.datagram(i), (args.host, args.port))
+        stats["frames"] += 1
+        stats["bits"] += int(cap.index["nbits"][i])
+
+def replay_demod(cap, lo, hi, args, stats):
+    for i in paced(cap, lo, hi, args.speed, stats):
+        iq = cap.iq(i)
+        estimate_snr_from_cloud(iq)
+        _, demod, _ = MOD_SCHEMES[SCHEME_NAMES[int(cap.index["scheme_id"][i])]]
+        demod(iq[:, 0] + 1j*iq[:, 1])
+        stats["frames"] += 1
+        stats["bits"] += int(cap.index["nbits"][i])
+
+def main():
+    p = argparse.ArgumentParser(description="Replay an IQ capture")
+    p.add_argument("path")
+    p.add_argument("--mode", choices=("udp", "demod"), default="udp")
+    p.add_argument("--speed", type=float, default=1.0, help="1 = recorded timing, 0 = as fast as possible")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=RX_DATA_PORT)
+    p.add_argument("--start", type=int, default=0, help="first frame index")
+    p.add_argument("--count", type=int, default=None, help="frames per loop (default: all)")
+    p.add_argument("--loops", type=int, default=1)
+    args = p.parse_args()
+
+    cap = Capture(args.path)
+    lo = args.start
+    hi = len(cap) if args.count is None else min(len(cap), lo + args.count)
+    if hi <= lo:
+        raise SystemExit(f"{args.path}: no frames in [{lo}, {hi})")
+    run = replay_udp if args.mode == "udp" else replay_demod
+
+    print(f"[Replay] {args.path}: frames {lo}..{hi-1} x{args.loops}  mode={args.mode}  speed={args.speed or 'max'}")
+    stats = {"frames": 0, "bits": 0, "late_ms": 0.0}
+    t0 = time.perf_counter()
+    try:
+        for _ in range(args.loops):
+            run(cap, lo, hi, args, stats)
+    except KeyboardInterrupt:
+        print("\n[Replay] Stopped.")
+    dt = time.perf_counter() - t0
+    print(f"[Replay] {stats['frames']} frames in {dt:.2f} s  "
+          f"({stats['frames']/dt:.0f} frames/s, {stats['bits']/dt/1e6:.2f} Mbit/s payload)"
+          + (f"  max lateness {stats['late_ms']:.1f} ms" if args.speed > 0 else ""))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
-import numpy as np, socket, time, struct, threading, collections
-from common import MOD_SCHEMES
+import numpy as np, socket, time, struct, threading, collections, os
+from contextlib import nullcontext
+from common import MOD_SCHEMES, ber, frame_bits, pack_feedback, MAX_OUTCOMES
+from capture import CaptureWriter
 
 BIND_IP = "0.0.0.0"
 RX_DATA_PORT = 6000
 TX_CONTROL_IP = "127.0.0.1"  # set to Transmitter IP
 TX_CONTROL_PORT = 6001
+# set (or export RX_CAPTURE=...) to record every received frame; see capture.py / replay.py
+CAPTURE_PATH = os.environ.get("RX_CAPTURE")
 
 lat_hist = collections.deque(maxlen=50)
 ber_hist = collections.deque(maxlen=50)
 snr_hist = collections.deque(maxlen=50)
+# (frame_id, measured BER) not yet reported to TX
+outcomes = collections.deque(maxlen=1000)
 
 def estimate_snr_from_cloud(iq: np.ndarray) -> float:
     pwr = np.mean(iq[:,0]**2 + iq[:,1]**2)
@@ -24,7 +30,8 @@ def feedback_sender():
         jitter_ms = float(np.std(lat_hist)) if len(lat_hist)>1 else 1.0
         recent_ber = float(np.mean(ber_hist)) if ber_hist else 0.01
         snr_db = float(np.mean(snr_hist)) if snr_hist else 8.0
-        payload = struct.pack("!ffff", snr_db, delay_ms, jitter_ms, recent_ber)
+        batch = [outcomes.popleft() for _ in range(min(len(outcomes), MAX_OUTCOMES))]
+        payload = pack_feedback(snr_db, delay_ms, jitter_ms, recent_ber, batch)
         s.sendto(payload, (TX_CONTROL_IP, TX_CONTROL_PORT))
         time.sleep(0.2)
 
@@ -34,29 +41,33 @@ def main():
     s.bind((BIND_IP, RX_DATA_PORT))
     print(f"[RX] Listening {RX_DATA_PORT}")
 
-    last_t = time.time()
-    while True:
-        data, addr = s.recvfrom(65535)
-        now = time.time()
-        lat_ms = (now - last_t)*1000.0
-        last_t = now
-        lat_hist.append(lat_ms)
-
-        header_sz = 4+1+4
-        frame_id, scheme_id, nbits = struct.unpack("!IBI", data[:header_sz])
-        iq = np.frombuffer(data[header_sz:], dtype=np.float32).reshape(-1,2)
+    # append-only capture; flushed/closed when the loop exits
+    with (CaptureWriter(CAPTURE_PATH) if CAPTURE_PATH else nullcontext()) as cap:
+        last_t = time.time()
+        while True:
+            data, addr = s.recvfrom(65535)
+            now = time.time()
+            if cap:
+                cap.append(data, now)
+            lat_ms = (now - last_t)*1000.0
+            last_t = now
+            lat_hist.append(lat_ms)
 
-        sdb = estimate_snr_from_cloud(iq); snr_hist.append(sdb)
+            header_sz = 4+1+4
+            frame_id, scheme_id, nbits = struct.unpack("!IBI", data[:header_sz])
+            iq = np.frombuffer(data[header_sz:], dtype=np.float32).reshape(-1,2)
 
-        # SNR→BER crude proxy for live display (real BER requires shared PRBS or payload compare)
-        if scheme_id == 1: b = 0.5*np.exp(-sdb/10)
-        elif scheme_id == 2: b = 0.5*np.exp(-sdb/10)
-        else: b = 0.6*np.exp(-sdb/9)
-        ber_hist.append(float(b))
+            sdb = estimate_snr_from_cloud(iq); snr_hist.append(sdb)
 
-        if frame_id % 10 == 0:
+            # real BER: the payload is a PRBS seeded by frame_id (common.frame_bits)
             scheme = {1:"BPSK",2:"QPSK",3:"16QAM"}[scheme_id]
-            print(f"[RX] frame={frame_id}  scheme={scheme}  snr≈{sdb:.1f} dB  delay≈{lat_ms:.1f} ms  BER~{b:.2e}")
+            _, demod, _ = MOD_SCHEMES[scheme]
+            b = ber(frame_bits(frame_id, nbits), demod(iq[:,0] + 1j*iq[:,1]))
+            ber_hist.append(b)
+            outcomes.append((frame_id, b))
+
+            if frame_id % 10 == 0:
+                print(f"[RX] frame={frame_id}  scheme={scheme}  snr≈{sdb:.1f} dB  delay≈{lat_ms:.1f} ms  BER~{b:.2e}")
 
 if __name__ == "__main__":
     main()
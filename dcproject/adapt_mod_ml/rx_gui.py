@@ -1,15 +1,73 @@
 # rx_gui.py  — Receiver with a tiny Tkinter dashboard
-import numpy as np, socket, time, struct, threading, collections
+#
+# Besides the text readouts the dashboard plots a live constellation and
+# SNR / inter-arrival delay over time. recv_loop publishes into fixed-size
+# Ring buffers (no locks, no allocation per frame); the GUI polls them every
+# PLOT_INTERVAL_MS, takes only what was written since its last read,
+# decimates it, and moves existing canvas items instead of recreating them.
+import numpy as np, socket, time, struct, threading, collections, os
+from contextlib import nullcontext
 import tkinter as tk
+from capture import CaptureWriter
+from common import MOD_SCHEMES, ber, frame_bits, pack_feedback, MAX_OUTCOMES
 
 BIND_IP = "0.0.0.0"
 RX_DATA_PORT = 6000
 TX_CONTROL_IP = "127.0.0.1"   # set to Transmitter IP if on different machine
 TX_CONTROL_PORT = 6001
+# set (or export RX_CAPTURE=...) to record every received frame; see capture.py / replay.py
+CAPTURE_PATH = os.environ.get("RX_CAPTURE")
 
 lat_hist = collections.deque(maxlen=50)
 ber_hist = collections.deque(maxlen=50)
 snr_hist = collections.deque(maxlen=50)
+# (frame_id, measured BER) not yet reported to TX
+outcomes = collections.deque(maxlen=1000)
+
+# ---- live plots ----
+PLOT_INTERVAL_MS = 100
+SERIES_LEN = 4096           # frames kept for the SNR / delay plots
+SERIES_WINDOW_S = 30.0      # time span shown
+IQ_RING_LEN = 8192          # newest constellation points kept
+IQ_PER_FRAME = 256          # points taken (strided) from each frame
+SCATTER_DOTS = 2000         # canvas items, reused round-robin
+SCATTER_PER_TICK = 400      # at most this many new points drawn per redraw
+IQ_LIMIT = 1.6              # constellation axes span [-IQ_LIMIT, +IQ_LIMIT]
+
+class Ring:
+    # Single-producer / single-consumer ring of fixed-width rows.
+    # The writer fills slots, then advances `written` (one int store, atomic
+    # under the GIL), so it never waits for the reader. The reader copies
+    # what is new and afterwards drops rows the writer may have overwritten
+    # meanwhile (it can be at most max_push rows into the next slots).
+    def __init__(self, size: int, width: int, dtype=np.float64, max_push: int = 1):
+        self.buf = np.zeros((size, width), dtype)
+        self.size = size
+        self.max_push = max_push
+        self.written = 0
+
+    def push(self, row):
+        self.buf[self.written % self.size] = row
+        self.written += 1
+
+    def push_many(self, rows: np.ndarray):
+        rows = rows[:self.max_push]
+        start = self.written % self.size
+        first = min(len(rows), self.size - start)
+        self.buf[start:start+first] = rows[:first]
+        self.buf[:len(rows)-first] = rows[first:]
+        self.written += len(rows)
+
+    def read_since(self, pos: int):
+        # -> (rows written since pos that are still intact, position to pass next time)
+        end = self.written
+        idx = np.arange(max(pos, end - self.size), end)
+        rows = self.buf[idx % self.size]
+        valid = self.written + self.max_push - self.size
+        return rows[idx >= valid], end
+
+series_ring = Ring(SERIES_LEN, 3)                                          # t, snr_db, delay_ms
+iq_ring = Ring(IQ_RING_LEN, 2, np.float32, max_push=IQ_PER_FRAME)         # I, Q
 
 # shared state for GUI
 state = {
@@ -36,7 +94,8 @@ def feedback_sender_loop():
         jitter_ms = float(np.std(lat_hist)) if len(lat_hist)>1 else 1.0
         recent_ber = float(np.mean(ber_hist)) if ber_hist else 0.01
         snr_db = float(np.mean(snr_hist)) if snr_hist else 8.0
-        payload = struct.pack("!ffff", snr_db, delay_ms, jitter_ms, recent_ber)
+        batch = [outcomes.popleft() for _ in range(min(len(outcomes), MAX_OUTCOMES))]
+        payload = pack_feedback(snr_db, delay_ms, jitter_ms, recent_ber, batch)
         s.sendto(payload, (TX_CONTROL_IP, TX_CONTROL_PORT))
         time.sleep(0.2)
 
@@ -46,32 +105,111 @@ def recv_loop():
     s.settimeout(2.0)
     last_t = time.time()
     print(f"[RX] Listening {RX_DATA_PORT}")
-    while state["running"]:
-        try:
-            data, addr = s.recvfrom(65535)
-        except socket.timeout:
-            continue
-        now = time.time()
-        lat_ms = (now - last_t)*1000.0
-        last_t = now
-        lat_hist.append(lat_ms)
-
-        header_sz = 4+1+4
-        frame_id, scheme_id, nbits = struct.unpack("!IBI", data[:header_sz])
-        iq = np.frombuffer(data[header_sz:], dtype=np.float32).reshape(-1,2)
-
-        sdb = estimate_snr_from_cloud(iq); snr_hist.append(sdb)
-        if scheme_id == 1: b = 0.5*np.exp(-sdb/10)
-        elif scheme_id == 2: b = 0.5*np.exp(-sdb/10)
-        else: b = 0.6*np.exp(-sdb/9)
-        ber_hist.append(float(b))
-
-        state["frame"] = frame_id
-        state["scheme"] = {1:"BPSK",2:"QPSK",3:"16QAM"}[scheme_id]
-        state["snr_db"] = float(sdb)
-        state["delay_ms"] = float(lat_ms)
-        state["jitter_ms"] = float(np.std(lat_hist)) if len(lat_hist)>1 else 1.0
-        state["ber"] = float(b)
+    # append-only capture; flushed/closed when the loop exits
+    with (CaptureWriter(CAPTURE_PATH) if CAPTURE_PATH else nullcontext()) as cap:
+        while state["running"]:
+            try:
+                data, addr = s.recvfrom(65535)
+            except socket.timeout:
+                continue
+            now = time.time()
+            if cap:
+                cap.append(data, now)
+            lat_ms = (now - last_t)*1000.0
+            last_t = now
+            lat_hist.append(lat_ms)
+
+            header_sz = 4+1+4
+            frame_id, scheme_id, nbits = struct.unpack("!IBI", data[:header_sz])
+            iq = np.frombuffer(data[header_sz:], dtype=np.float32).reshape(-1,2)
+
+            sdb = estimate_snr_from_cloud(iq); snr_hist.append(sdb)
+            # real BER: the payload is a PRBS seeded by frame_id (common.frame_bits)
+            scheme = {1:"BPSK",2:"QPSK",3:"16QAM"}[scheme_id]
+            _, demod, _ = MOD_SCHEMES[scheme]
+            b = ber(frame_bits(frame_id, nbits), demod(iq[:,0] + 1j*iq[:,1]))
+            ber_hist.append(b)
+            outcomes.append((frame_id, b))
+
+            state["frame"] = frame_id
+            state["scheme"] = scheme
+            state["snr_db"] = float(sdb)
+            state["delay_ms"] = float(lat_ms)
+            state["jitter_ms"] = float(np.std(lat_hist)) if len(lat_hist)>1 else 1.0
+            state["ber"] = float(b)
+
+            series_ring.push((now, sdb, lat_ms))
+            iq_ring.push_many(iq[::max(1, len(iq) // IQ_PER_FRAME)])
+
+def decimate(x: np.ndarray, y: np.ndarray, width: int):
+    # x in pixels (ascending). Beyond 2 samples per pixel column, keep the
+    # min and max of each column so spikes stay visible.
+    if len(x) <= 2*width:
+        return x, y
+    col = np.clip(x.astype(int), 0, width - 1)
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    lo, hi = np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)
+    return np.repeat(col[starts] + 0.5, 2), np.column_stack([hi, lo]).ravel()
+
+class ScatterPlot:
+    # Constellation: a fixed pool of dots; each redraw moves the oldest ones
+    # to the newest points, so only new points cost canvas calls.
+    def __init__(self, canvas, ring: Ring, size: int = 300):
+        self.cv, self.ring, self.size = canvas, ring, size
+        self.pos = 0
+        self.next = 0
+        c = size / 2
+        canvas.create_line(0, c, size, c, fill="#334155")
+        canvas.create_line(c, 0, c, size, fill="#334155")
+        self.dots = [canvas.create_rectangle(-4, -4, -4, -4, outline="", fill="#93c5fd")
+                     for _ in range(SCATTER_DOTS)]
+
+    def redraw(self):
+        pts, self.pos = self.ring.read_since(self.pos)
+        if len(pts) > SCATTER_PER_TICK:
+            pts = pts[np.linspace(0, len(pts) - 1, SCATTER_PER_TICK).astype(int)]
+        k = self.size / (2*IQ_LIMIT)
+        xs = ((pts[:, 0] + IQ_LIMIT) * k).tolist()
+        ys = ((IQ_LIMIT - pts[:, 1]) * k).tolist()
+        for x, y in zip(xs, ys):
+            self.cv.coords(self.dots[self.next], x - 1, y - 1, x + 1, y + 1)
+            self.next = (self.next + 1) % SCATTER_DOTS
+
+class SeriesPlot:
+    # SNR (top) and delay (bottom) over the last SERIES_WINDOW_S seconds.
+    # New rows are appended to a local history; each line is one coords() call.
+    def __init__(self, canvas, ring: Ring, width: int = 480, height: int = 300):
+        self.cv, self.ring, self.w, self.h = canvas, ring, width, height
+        self.pos = 0
+        self.hist = np.zeros((0, 3))
+        half = height / 2
+        canvas.create_line(0, half, width, half, fill="#334155")
+        self.panels = []
+        for top, name, color in ((0, "SNR (dB)", "#2ecc71"), (half, "Delay (ms)", "#f472b6")):
+            line = canvas.create_line(0, 0, 0, 0, fill=color)
+            label = canvas.create_text(6, top + 4, anchor="nw", text=name, fill="#94a3b8", font=("Segoe UI", 9))
+            self.panels.append((top, name, line, label))
+
+    def redraw(self):
+        rows, self.pos = self.ring.read_since(self.pos)
+        if len(rows):
+            self.hist = np.concatenate([self.hist, rows])[-SERIES_LEN:]
+        if len(self.hist) < 2:
+            return
+        t_end = self.hist[-1, 0]
+        h = self.hist[self.hist[:, 0] >= t_end - SERIES_WINDOW_S]
+        x = (h[:, 0] - (t_end - SERIES_WINDOW_S)) / SERIES_WINDOW_S * (self.w - 1)
+        ph = self.h / 2 - 20
+        for col, (top, name, line, label) in zip((1, 2), self.panels):
+            y = h[:, col]
+            lo, hi = (float(y.min()), float(y.max())) if col == 1 else (0.0, float(y.max()))
+            lo, hi = lo - 0.05*(hi - lo) - 0.5, hi + 0.05*(hi - lo) + 0.5
+            xs, ys = decimate(x, y, self.w)
+            py = top + 16 + (hi - ys) / (hi - lo) * ph
+            if len(xs) < 2:
+                continue
+            self.cv.coords(line, *np.column_stack([xs, py]).ravel().tolist())
+            self.cv.itemconfig(label, text=f"{name}  {y[-1]:.1f}")
 
 def make_gui():
     root = tk.Tk()
@@ -87,11 +225,25 @@ def make_gui():
     snr_v   = row(1, "SNR (dB)")
     delay_v = row(2, "Delay (ms)")
     jitter_v= row(3, "Jitter (ms)")
-    ber_v   = row(4, "BER (est.)")
+    ber_v   = row(4, "BER")
 
     status = tk.Label(root, text="LINK STATUS", font=("Segoe UI", 12, "bold"), width=16)
     status.grid(row=0, column=2, rowspan=5, padx=12, pady=6, sticky="ns")
 
+    plots = tk.Frame(root)
+    plots.grid(row=5, column=0, columnspan=3, padx=8, pady=8)
+    const_cv = tk.Canvas(plots, width=300, height=300, bg="#0f172a", highlightthickness=0)
+    const_cv.grid(row=0, column=0, padx=(0, 8))
+    series_cv = tk.Canvas(plots, width=480, height=300, bg="#0f172a", highlightthickness=0)
+    series_cv.grid(row=0, column=1)
+    scatter = ScatterPlot(const_cv, iq_ring, 300)
+    series = SeriesPlot(series_cv, series_ring, 480, 300)
+
+    def plot_tick():
+        scatter.redraw()
+        series.redraw()
+        root.after(PLOT_INTERVAL_MS, plot_tick)
+
     def color_for_snr(s):
         if s >= 12:  return "#2ecc71"   # green
         if s >= 6:   return "#f1c40f"   # yellow
@@ -113,11 +265,14 @@ def make_gui():
 
     root.protocol("WM_DELETE_WINDOW", on_close)
     tick()
+    plot_tick()
     return root
 
 if __name__ == "__main__":
     threading.Thread(target=feedback_sender_loop, daemon=True).start()
-    threading.Thread(target=recv_loop, daemon=True).start()
+    rx_thread = threading.Thread(target=recv_loop, daemon=True)
+    rx_thread.start()
     app = make_gui()
     app.mainloop()
+    rx_thread.join(timeout=3.0)  # let recv_loop close the capture file
     print("[RX] Closed.")
@@ -46,13 +46,16 @@ def gen_data(N=6000, seed=1):
         y.append(lab)
     return np.array(X, float), np.array(y, int)
 
-def main():
-    X, y = gen_data()
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
-    pipe = Pipeline([
+def new_pipeline():
+    return Pipeline([
         ('sc', StandardScaler()),
         ('dt', DecisionTreeClassifier(max_depth=6, random_state=42))
     ])
+
+def main():
+    X, y = gen_data()
+    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    pipe = new_pipeline()
     pipe.fit(Xtr, ytr)
     pred = pipe.predict(Xte)
     print("Accuracy:", accuracy_score(yte, pred))
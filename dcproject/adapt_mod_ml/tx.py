@@ -1,5 +1,6 @@
-import numpy as np, socket, time, pickle, os, threading, struct
-from common import MOD_SCHEMES, add_awgn
+import numpy as np, socket, time, pickle, os, threading, struct, collections
+from common import MOD_SCHEMES, add_awgn, frame_bits, unpack_feedback
+from online import LinkLog, PolicySlot, ThresholdPolicy, retrain_loop, LOG_DIR
 
 CONTROL_IP = "0.0.0.0"     # feedback listener bind
 CONTROL_PORT = 6001
@@ -7,6 +8,8 @@ TX_TARGET_IP = "127.0.0.1" # set to Receiver IP
 TX_DATA_PORT = 6000
 FRAME_BITS = 4096
 USE_ML = True
+ONLINE_RETRAIN = False     # log per-frame outcomes and retrain/hot-swap the policy (online.py)
+SAVE_RETRAINED = False     # also write swapped-in policies to MODEL_PATH
 
 MODEL_PATH = "model.pkl"
 model = None
@@ -14,6 +17,13 @@ if USE_ML and os.path.exists(MODEL_PATH):
     with open(MODEL_PATH, "rb") as f:
         model = pickle.load(f)
     print("[TX] ML model loaded.")
+# the send loop reads the live policy from here; online.py swaps it
+policy = PolicySlot(model if model is not None else ThresholdPolicy())
+link_log = None            # LinkLog, opened in main() when ONLINE_RETRAIN
+# frame_id -> (t, features, scheme, version) of sent frames awaiting their measured BER
+unreported = collections.OrderedDict()
+unreported_lock = threading.Lock()
+UNREPORTED_MAX = 1000      # older frames are assumed lost
 
 feedback = {"snr_db": 8.0, "delay_ms": 10.0, "jitter_ms": 2.0, "recent_ber": 0.01}
 
@@ -22,33 +32,49 @@ def feedback_listener():
     s.bind((CONTROL_IP, CONTROL_PORT))
     print(f"[TX] Feedback on {CONTROL_PORT}")
     while True:
-        data, _ = s.recvfrom(1024)
+        data, _ = s.recvfrom(2048)
         try:
-            snr_db, delay_ms, jitter_ms, recent_ber = struct.unpack("!ffff", data)
+            (snr_db, delay_ms, jitter_ms, recent_ber), outcomes = unpack_feedback(data)
             feedback.update(snr_db=snr_db, delay_ms=delay_ms, jitter_ms=jitter_ms, recent_ber=recent_ber)
         except Exception:
-            pass
+            continue
+        if link_log:
+            # each outcome is the BER RX measured on that very frame
+            for frame_id, ber in outcomes:
+                with unreported_lock:
+                    sent = unreported.pop(frame_id, None)
+                if sent:
+                    t, x, scheme, version = sent
+                    link_log.record(*x, scheme, ber, FRAME_BITS, version, t)
 
-def pick_modulation():
-    x = np.array([[feedback["snr_db"], feedback["delay_ms"], feedback["jitter_ms"], feedback["recent_ber"]]], float)
-    if model is not None:
-        m = model.predict(x)[0]
-        return ["BPSK","QPSK","16QAM"][int(m)]
-    return "BPSK" if feedback["snr_db"] < 6 else ("QPSK" if feedback["snr_db"] < 12 else "16QAM")
+def pick_modulation(model, x):
+    m = model.predict(x)[0]
+    return ["BPSK","QPSK","16QAM"][int(m)]
 
 def main():
+    global link_log
+    if ONLINE_RETRAIN:
+        link_log = LinkLog(LOG_DIR)
+        threading.Thread(target=retrain_loop, args=(link_log, policy, MODEL_PATH if SAVE_RETRAINED else None),
+                         daemon=True).start()
     threading.Thread(target=feedback_listener, daemon=True).start()
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.connect((TX_TARGET_IP, TX_DATA_PORT))
 
-    rng = np.random.default_rng(0)
     frame_id = 0
 
     print("[TX] Sending… Ctrl+C to stop.")
     try:
         while True:
-            bits = rng.integers(0, 2, size=FRAME_BITS, endpoint=True, dtype=np.uint8)
-            scheme = pick_modulation()
+            bits = frame_bits(frame_id, FRAME_BITS)
+            x = np.array([[feedback["snr_db"], feedback["delay_ms"], feedback["jitter_ms"], feedback["recent_ber"]]], float)
+            version, model = policy.current()
+            scheme = pick_modulation(model, x)
+            if link_log:
+                with unreported_lock:
+                    unreported[frame_id] = (time.time(), x[0].tolist(), scheme, version)
+                    if len(unreported) > UNREPORTED_MAX:
+                        unreported.popitem(last=False)
             mod, demod, k = MOD_SCHEMES[scheme]
             syms = mod(bits)
 
@@ -66,6 +92,9 @@ def main():
             time.sleep(0.02)
     except KeyboardInterrupt:
         print("\n[TX] Stopped.")
+    finally:
+        if link_log:
+            link_log.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+# app/artifacts.py
+# Chart/preview data for a sent frame, produced off the hot path.
+# At send time only a few small slices are captured (O(preview size), not
+# O(payload)); formatting happens the first time a page asks for the frame
+# and the result is memoized in a small per-process LRU keyed by frame id.
+import base64, itertools, os
+from collections import OrderedDict
+
+import numpy as np
+
+from .channel import iq_packed
+from .pulse_shaping import waveform_preview, SPS, SPAN
+
+ARTIFACT_CACHE_SIZE = 64       # ~250 KB per frame at the preview sizes below
+PREVIEW_BITS = 256
+# constellation points / waveform samples per preview; sent packed
+# (channel.iq_packed) and drawn as a density map by static/main.js
+PREVIEW_POINTS = 20000
+PREVIEW_SAMPLES = 4096
+PREVIEW_B64_CHARS = 260
+# per room, frames closer together than this get no previews
+PREVIEW_MIN_INTERVAL = 0.25
+
+_ids = itertools.count(1)
+
+def next_frame_id() -> str:
+    # unique across workers sharing a hub
+    return f"{os.getpid():x}-{next(_ids)}"
+
+def frame_owner(frame_id: str):
+    # pid of the worker that produced frame_id (its ArtifactCache has it), or None
+    try:
+        return int(frame_id.split("-", 1)[0], 16)
+    except ValueError:
+        return None
+
+# ---- bit formatting (vectorized) ----
+def head_bits(buf: bytes, max_bits: int = PREVIEW_BITS) -> np.ndarray:
+    # unpack only the bytes that are shown
+    head = np.frombuffer(buf[:-(-max_bits // 8)], dtype=np.uint8)
+    return np.unpackbits(head)[:max_bits]
+
+def bits_str(buf: bytes, max_bits: int = PREVIEW_BITS, group: int = 8, line: int = 64) -> str:
+    # "01010101 00110011 ..." with a newline every `line` bits
+    chars = head_bits(buf, max_bits) + ord("0")
+    full = len(chars) // group * group
+    rows = chars[:full].reshape(-1, group)
+    n = rows.shape[0]
+    sep = np.full((n, 2), 0, dtype=np.uint8)
+    sep[:, 0] = ord(" ")
+    sep[(np.arange(n) + 1) % (line // group) == 0, 1] = ord("\n")
+    text = np.hstack([rows, sep]).tobytes().replace(b"\0", b"") + chars[full:].tobytes()
+    return text.decode("ascii").strip()
+
+def bits_list(buf: bytes, max_bits: int = PREVIEW_BITS):
+    return head_bits(buf, max_bits).astype(int).tolist()
+
+def b64_head(buf: bytes, max_chars: int = PREVIEW_B64_CHARS) -> str:
+    # first max_chars of the base64 text, encoding only what is shown
+    return base64.b64encode(buf[:max_chars // 4 * 3]).decode()
+
+# ---- per-frame artifacts ----
+class FrameArtifacts:
+    def __init__(self, ct: bytes, fec_ct: bytes, noisy: bytes,
+                 I_clean, Q_clean, I_noisy, Q_noisy, snr: float):
+        nbytes = max(PREVIEW_BITS // 8, PREVIEW_B64_CHARS // 4 * 3)
+        self.heads = {"raw": ct[:nbytes], "clean": fec_ct[:nbytes], "noisy": noisy[:nbytes]}
+        self.lens = {"raw": len(ct), "clean": len(fec_ct), "noisy": len(noisy)}
+        # packed right away (int16, ~107 KB each at PREVIEW_POINTS): this is
+        # what is sent, and it does not keep the full symbol arrays alive
+        self.const_clean = iq_packed(I_clean, Q_clean, PREVIEW_POINTS)
+        self.const_noisy = iq_packed(I_noisy, Q_noisy, PREVIEW_POINTS)
+        nsym = max(1, PREVIEW_SAMPLES // SPS - 2*SPAN)
+        self.wave_syms = (np.array(I_clean[:nsym]), np.array(Q_clean[:nsym]))
+        self.snr = snr
+        self._rendered = None
+
+    def render(self) -> dict:
+        if self._rendered is None:
+            out = {
+                "const_clean": self.const_clean,
+                "const_noisy": self.const_noisy,
+                "wave_clean": iq_packed(*waveform_preview(*self.wave_syms, max_samples=PREVIEW_SAMPLES), PREVIEW_SAMPLES),
+                "wave_noisy": iq_packed(*waveform_preview(*self.wave_syms, self.snr, max_samples=PREVIEW_SAMPLES), PREVIEW_SAMPLES),
+            }
+            for k, buf in self.heads.items():
+                # cipher_* keep the old field names; *_len is the full base64 length
+                out["cipher_" + k] = b64_head(buf)
+                out["cipher_" + k + "_len"] = 4 * (-(-self.lens[k] // 3))
+                out["bits_" + k] = bits_str(buf)
+                out["bits_plot_" + k] = bits_list(buf)
+            self._rendered = out
+            # everything below is now in out
+            self.heads = self.wave_syms = None
+        return self._rendered
+
+class ArtifactCache:
+    def __init__(self, maxsize: int = ARTIFACT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, FrameArtifacts]" = OrderedDict()
+
+    def put(self, frame_id: str, art: FrameArtifacts):
+        self._items[frame_id] = art
+        self._items.move_to_end(frame_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def get(self, frame_id: str):
+        art = self._items.get(frame_id)
+        if art is not None:
+            self._items.move_to_end(frame_id)
+        return art
+
+    def __len__(self):
+        return len(self._items)
@@ -12,19 +12,33 @@ def derive_key(password: str, salt: bytes) -> bytes:
     )
     return kdf.derive(password.encode("utf-8"))
 
-def encrypt_bytes(plain: bytes, password: str):
-    salt = os.urandom(16)
-    key = derive_key(password, salt)
+def new_salt() -> bytes:
+    return os.urandom(16)
+
+# Key-level halves of encrypt_bytes/decrypt_bytes, so callers can time
+# (or reuse) the PBKDF2 step separately from AES-GCM
+def encrypt_with_key(plain: bytes, key: bytes):
     iv = os.urandom(12)
     aes = AESGCM(key)
     ct = aes.encrypt(iv, plain, None)
+    return iv, ct
+
+def decrypt_with_key(cipher: bytes, key: bytes, iv: bytes):
+    try:
+        aes = AESGCM(key)
+        return aes.decrypt(iv, cipher, None)
+    except Exception:
+        return None
+
+def encrypt_bytes(plain: bytes, password: str):
+    salt = new_salt()
+    key = derive_key(password, salt)
+    iv, ct = encrypt_with_key(plain, key)
     return iv, salt, ct
 
 def decrypt_bytes(cipher: bytes, password: str, iv: bytes, salt: bytes):
     try:
         key = derive_key(password, salt)
-        aes = AESGCM(key)
-        pt = aes.decrypt(iv, cipher, None)
-        return pt
     except Exception:
         return None
+    return decrypt_with_key(cipher, key, iv)
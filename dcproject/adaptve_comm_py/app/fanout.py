@@ -0,0 +1,120 @@
+# app/fanout.py
+import asyncio, json
+from typing import Any, Dict, Iterable
+
+from fastapi import WebSocket
+
+from . import metrics
+
+# Per-connection outbound queue depth and what to do when it is full:
+#   "drop"       -> discard the oldest queued message (viewer skips frames)
+#   "disconnect" -> close the lagging connection
+SEND_QUEUE_MAX = 32
+SEND_QUEUE_MAX_BYTES = 8 * 1024 * 1024
+SLOW_CONSUMER_POLICY = "drop"
+
+metrics.counter("ws_send_dropped_total", "Queued messages dropped for slow receivers")
+metrics.counter("ws_slow_disconnects_total", "Connections closed for falling behind")
+
+def encode(msg: Dict[str, Any]) -> str:
+    # same wire format as WebSocket.send_json
+    return json.dumps(msg, separators=(",", ":"), ensure_ascii=False)
+
+def encode_body(msg: Dict[str, Any]) -> str:
+    # Serialize everything except "type" once; with_type() then stamps
+    # cheap per-audience variants (frame_rx / frame_preview) from it.
+    body = {k: v for k, v in msg.items() if k != "type"}
+    return encode(body)
+
+def with_type(body: str, msg_type: str) -> str:
+    head = '{"type":' + json.dumps(msg_type)
+    return head + ("}" if body == "{}" else "," + body[1:])
+
+class Subscriber:
+    # One websocket plus a bounded send queue drained by its own task, so a
+    # slow browser only ever backs up its own queue, never the sender.
+    def __init__(self, ws: WebSocket, role: str, maxsize: int = None, policy: str = None):
+        self.ws = ws
+        self.role = role
+        self.policy = policy or SLOW_CONSUMER_POLICY
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize or SEND_QUEUE_MAX)
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.closed = False
+        # page has charts visible and wants frame_artifacts
+        self.previews = False
+        self._task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                self.queued_bytes -= len(text)
+                await self.ws.send_text(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # socket went away underneath us; the receive loop cleans up
+            self.closed = True
+            self._clear()
+
+    def send(self, text: str) -> bool:
+        if self.closed:
+            return False
+        # bounded by both message count and queued bytes; a single message
+        # larger than the byte cap is still accepted into an empty queue
+        # (one big frame is not a slow consumer)
+        fits = self.queue.empty() or self.queued_bytes + len(text) <= SEND_QUEUE_MAX_BYTES
+        if not self.queue.full() and fits:
+            self._put(text)
+            return True
+        if self.policy == "disconnect":
+            metrics.inc("ws_slow_disconnects_total")
+            self.close(code=1013, reason="receiver too slow")
+            return False
+        while not self.queue.empty() and (self.queue.full() or self.queued_bytes + len(text) > SEND_QUEUE_MAX_BYTES):
+            self.queued_bytes -= len(self.queue.get_nowait())
+            self.dropped += 1
+            metrics.inc("ws_send_dropped_total")
+        self._put(text)
+        return True
+
+    def _put(self, text: str):
+        self.queue.put_nowait(text)
+        self.queued_bytes += len(text)
+
+    def send_json(self, msg: Dict[str, Any]) -> bool:
+        return self.send(encode(msg))
+
+    def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self._task.cancel()
+        self._clear()
+        asyncio.create_task(self._close_ws(code, reason))
+
+    async def _close_ws(self, code: int, reason: str):
+        try:
+            await self.ws.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def detach(self):
+        # peer already disconnected: stop the pump, nothing left to flush
+        self.closed = True
+        self._task.cancel()
+        self._clear()
+
+    def _clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queued_bytes = 0
+
+def broadcast(subs: Iterable[Subscriber], text: str) -> int:
+    # Enqueue one pre-encoded message on every subscriber; never awaits
+    n = 0
+    for sub in list(subs):
+        if sub.send(text):
+            n += 1
+    return n
@@ -0,0 +1,158 @@
+# app/hub.py
+# Tiny pub/sub broker over a Unix socket so several uvicorn workers can share
+# rooms. Workers subscribe to the rooms they have local sockets for; the hub
+# forwards each publish to every *other* subscribed worker and keeps the
+# latest SNR per room (answering each "sub" with "joined") so late joiners
+# see the current channel setting. SNR for rooms nobody subscribes to is
+# forgotten after HUB_IDLE_TTL seconds.
+#
+# Workers also report how many of their sockets in a room show charts
+# ("viewers"); each subscribed worker is told the count on the *other*
+# workers, so frames get previews only if someone anywhere is looking.
+# "get_preview" is routed to the worker whose pid the frame id carries
+# (announced with "hello") and its "preview" reply back to the asker.
+#
+# Run:  python -m app.hub [socket_path]
+import asyncio, json, os, struct, sys, time
+
+HUB_SOCKET = os.environ.get("ROOM_HUB_SOCKET", "/tmp/dcproject-rooms.sock")
+# per-worker outbound buffer limit; frames beyond it are dropped for that worker
+HUB_MAX_BUFFER = 8 * 1024 * 1024
+HUB_IDLE_TTL = 300.0
+
+_HDR = struct.Struct("!II")
+
+# -------------------------------
+# Wire format: !II (header_len, body_len) + JSON header + raw body bytes
+# -------------------------------
+def pack_msg(header: dict, body: bytes = b"") -> bytes:
+    h = json.dumps(header, separators=(",", ":")).encode()
+    return _HDR.pack(len(h), len(body)) + h + body
+
+async def read_msg(reader: asyncio.StreamReader):
+    hlen, blen = _HDR.unpack(await reader.readexactly(_HDR.size))
+    header = json.loads(await reader.readexactly(hlen))
+    body = await reader.readexactly(blen) if blen else b""
+    return header, body
+
+# -------------------------------
+# Broker
+# -------------------------------
+class Hub:
+    def __init__(self):
+        self.workers = {}    # writer -> set(room_id)
+        self.pids = {}       # worker pid -> writer
+        self.snr = {}        # room_id -> float
+        self.viewers = {}    # room_id -> {writer: sockets showing charts}
+        self.idle_since = {} # room_id -> monotonic time the last worker unsubscribed
+
+    def _send(self, writer, data: bytes):
+        if writer.transport.get_write_buffer_size() > HUB_MAX_BUFFER:
+            return
+        writer.write(data)
+
+    async def handle(self, reader, writer):
+        rooms = self.workers[writer] = set()
+        pid = None
+        try:
+            while True:
+                header, body = await read_msg(reader)
+                op = header["op"]
+                room_id = header.get("room")
+                if op == "hello":
+                    pid = header["pid"]
+                    self.pids[pid] = writer
+                elif op == "sub":
+                    rooms.add(room_id)
+                    self.idle_since.pop(room_id, None)
+                    self._send(writer, pack_msg({"op": "joined", "room": room_id, "snr": self.snr.get(room_id),
+                                                 "viewers": self._remote_viewers(room_id, writer)}))
+                elif op == "unsub":
+                    rooms.discard(room_id)
+                    self._set_viewers(room_id, writer, 0)
+                    self._mark_idle(room_id)
+                elif op == "viewers":
+                    self._set_viewers(room_id, writer, header["n"])
+                elif op == "get_preview":
+                    owner = self.pids.get(header["pid"])
+                    if owner is None or pid is None:
+                        self._send(writer, pack_msg({"op": "preview", "req": header["req"]}))   # miss
+                    else:
+                        self._send(owner, pack_msg({**header, "src": pid}))
+                elif op == "preview":
+                    asker = self.pids.get(header["dst"])
+                    if asker is not None:
+                        self._send(asker, pack_msg({"op": "preview", "req": header["req"]}, body))
+                elif op == "snr":
+                    self.snr[room_id] = header["snr"]
+                    data = pack_msg(header)
+                    for w, subs in self.workers.items():
+                        if w is not writer and room_id in subs:
+                            self._send(w, data)
+                elif op == "pub":
+                    data = pack_msg(header, body)
+                    for w, subs in self.workers.items():
+                        if w is not writer and room_id in subs:
+                            self._send(w, data)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.workers.pop(writer, None)
+            if self.pids.get(pid) is writer:
+                del self.pids[pid]
+            for room_id in rooms:
+                self._set_viewers(room_id, writer, 0)
+                self._mark_idle(room_id)
+            writer.close()
+
+    def _remote_viewers(self, room_id: str, writer) -> int:
+        return sum(n for w, n in self.viewers.get(room_id, {}).items() if w is not writer)
+
+    def _set_viewers(self, room_id: str, writer, n: int):
+        counts = self.viewers.setdefault(room_id, {})
+        if counts.get(writer, 0) == n:
+            if not counts:
+                del self.viewers[room_id]
+            return
+        if n:
+            counts[writer] = n
+        else:
+            counts.pop(writer, None)
+        if not counts:
+            del self.viewers[room_id]
+        for w, subs in self.workers.items():
+            if w is not writer and room_id in subs:
+                self._send(w, pack_msg({"op": "viewers", "room": room_id, "n": self._remote_viewers(room_id, w)}))
+
+    def _mark_idle(self, room_id: str):
+        if not any(room_id in subs for subs in self.workers.values()):
+            self.idle_since[room_id] = time.monotonic()
+
+    def sweep(self, now: float = None) -> int:
+        now = time.monotonic() if now is None else now
+        stale = [rid for rid, t in self.idle_since.items() if now - t > HUB_IDLE_TTL]
+        for rid in stale:
+            del self.idle_since[rid]
+            self.snr.pop(rid, None)
+        return len(stale)
+
+    async def gc_loop(self, interval: float = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+async def serve(path: str = HUB_SOCKET):
+    if os.path.exists(path):
+        os.unlink(path)
+    hub = Hub()
+    server = await asyncio.start_unix_server(hub.handle, path=path)
+    asyncio.create_task(hub.gc_loop())
+    print(f"[HUB] listening on {path}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(sys.argv[1] if len(sys.argv) > 1 else HUB_SOCKET))
+    except KeyboardInterrupt:
+        pass
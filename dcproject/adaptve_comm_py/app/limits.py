@@ -0,0 +1,49 @@
+# app/limits.py
+# Per-connection guards applied to every incoming websocket message.
+import os, time
+
+# Largest accepted message. Keep at or below uvicorn's --ws-max-size
+# (16 MiB by default); raise both together to allow larger files.
+MAX_MESSAGE_BYTES = int(os.environ.get("WS_MAX_MESSAGE_BYTES", 16 * 1024 * 1024))
+# RX sends every frame back in rx_decrypt as base64 of the rep3 output,
+# about 4x the payload, so payloads are capped for that request to fit.
+RX_DECRYPT_HEADROOM = 64 * 1024   # other JSON fields, password, AEAD tags
+MAX_PAYLOAD_BYTES = (MAX_MESSAGE_BYTES - RX_DECRYPT_HEADROOM) // 4
+# Sustained messages/s and bytes/s per connection, with bursts up to the caps
+RATE_LIMIT_MSGS = 20.0
+RATE_BURST_MSGS = 40
+RATE_LIMIT_BYTES = 8 * 1024 * 1024
+RATE_BURST_BYTES = MAX_MESSAGE_BYTES
+MAX_ROOM_ID_LEN = 64
+MAX_FRAME_ID_LEN = 32   # artifacts.next_frame_id is pid hex + counter
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, n: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp)*self.rate)
+        self.stamp = now
+        if self.tokens < n:
+            return False
+        self.tokens -= n
+        return True
+
+class ConnectionLimits:
+    # check() returns None if the message may be processed, else a reason
+    def __init__(self):
+        self.msgs = TokenBucket(RATE_LIMIT_MSGS, RATE_BURST_MSGS)
+        self.bytes = TokenBucket(RATE_LIMIT_BYTES, RATE_BURST_BYTES)
+
+    def check(self, size: int):
+        if size > MAX_MESSAGE_BYTES:
+            return "size"
+        if not self.msgs.take():
+            return "rate"
+        if not self.bytes.take(size):
+            return "rate"
+        return None
@@ -0,0 +1,156 @@
+# app/metrics.py
+# Minimal Prometheus-text metrics: counters bumped on the hot path, gauges
+# computed by callbacks at scrape time, and fixed-bucket histograms for the
+# per-stage pipeline timers. Served by server.py on /metrics.
+import bisect, os, sys, time
+from typing import Callable, Dict, List, Tuple
+
+_help: Dict[str, Tuple[str, str]] = {}                 # name -> (type, help)
+_counters: Dict[Tuple[str, Tuple], float] = {}         # (name, labels) -> value
+_gauges: Dict[str, Callable[[], object]] = {}          # name -> fn() -> float | {labels: float}
+_hists: Dict[str, "Histogram"] = {}
+
+def _labels(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+def _fmt_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+def _fmt_value(v) -> str:
+    v = float(v)
+    return str(int(v)) if v.is_integer() else repr(v)
+
+def counter(name: str, help: str):
+    _help[name] = ("counter", help)
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name: str, help: str, fn: Callable[[], object]):
+    # fn returns a number, or a dict mapping label-dicts (as tuples) to numbers
+    _help[name] = ("gauge", help)
+    _gauges[name] = fn
+
+def labels(**kw) -> Tuple:
+    return _labels(kw)
+
+# -------------------------------
+# Histograms: one counts array per label set, so memory is fixed by the
+# (bounded) label space, not by the number of observations
+# -------------------------------
+# seconds, 100 µs .. 30 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple, List] = {}   # labels -> [counts..., +Inf count, sum]
+
+    def observe(self, value: float, lbl: Tuple = ()):
+        row = self.series.get(lbl)
+        if row is None:
+            row = self.series[lbl] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def lines(self, name: str):
+        for lbl, row in self.series.items():
+            cum = 0
+            for le, c in zip(self.buckets + ("+Inf",), row[:-1]):
+                cum += c
+                yield f"{name}_bucket{_fmt_labels(lbl + (('le', le),))} {cum}"
+            yield f"{name}_sum{_fmt_labels(lbl)} {_fmt_value(row[-1])}"
+            yield f"{name}_count{_fmt_labels(lbl)} {cum}"
+
+def histogram(name: str, help: str, buckets=LATENCY_BUCKETS) -> Histogram:
+    _help[name] = ("histogram", help)
+    h = _hists[name] = Histogram(buckets)
+    return h
+
+def observe(name: str, value: float, **labels):
+    _hists[name].observe(value, _labels(labels))
+
+# payload-size label for stage timings
+SIZE_BUCKETS = ((1 << 10, "1KiB"), (16 << 10, "16KiB"), (256 << 10, "256KiB"),
+                (4 << 20, "4MiB"), (64 << 20, "64MiB"))
+
+def size_bucket(nbytes: int) -> str:
+    for limit, name in SIZE_BUCKETS:
+        if nbytes <= limit:
+            return name
+    return "large"
+
+class Stages:
+    # Per-request stage timer. Durations are kept in a short list and only
+    # turned into histogram observations by commit(), so stages timed before
+    # the scheme is known still get the scheme label.
+    #
+    #   st = Stages("send_text", len(payload))
+    #   with st("kdf"): ...
+    #   st.scheme = scheme
+    #   st.commit()
+    def __init__(self, path: str, nbytes: int, scheme: str = "-"):
+        self.path = path
+        self.size = size_bucket(nbytes)
+        self.scheme = scheme
+        self.t0 = time.perf_counter()
+        self._done = []
+        self._name = None
+        self._start = 0.0
+
+    def __call__(self, stage: str):
+        self._name = stage
+        return self
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.append((self._name, time.perf_counter() - self._start))
+        return False
+
+    def commit(self):
+        h = _hists["pipeline_stage_seconds"]
+        base = (("path", self.path), ("scheme", self.scheme), ("size", self.size))
+        for stage, dt in self._done:
+            h.observe(dt, tuple(sorted(base + (("stage", stage),))))
+        h.observe(time.perf_counter() - self.t0, tuple(sorted(base + (("stage", "total"),))))
+
+histogram("pipeline_stage_seconds", "Time per server pipeline stage, by path, scheme and payload size")
+
+def render() -> str:
+    out = []
+    by_name: Dict[str, list] = {}
+    for (name, lbl), v in _counters.items():
+        by_name.setdefault(name, []).append((lbl, v))
+    for name, (kind, text) in _help.items():
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            out.extend(_hists[name].lines(name))
+            continue
+        if kind == "gauge":
+            val = _gauges[name]()
+            samples = val.items() if isinstance(val, dict) else [((), val)]
+        else:
+            samples = by_name.get(name, [((), 0)])
+        for lbl, v in samples:
+            out.append(f"{name}{_fmt_labels(lbl)} {_fmt_value(v)}")
+    return "\n".join(out) + "\n"
+
+def rss_bytes() -> int:
+    # current resident set size; falls back to peak RSS off Linux
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        if sys.platform == "win32":
+            return 0
+        import resource  # not available on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
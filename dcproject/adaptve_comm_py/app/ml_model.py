@@ -35,12 +35,21 @@ def gen(N=5000, seed=1):
         X.append([snr, delay, jitter, recent]); y.append(lab)
     return np.array(X,float), np.array(y,int)
 
+def new_pipeline():
+    return Pipeline([('sc',StandardScaler()),('dt',DecisionTreeClassifier(max_depth=6,random_state=42))])
+
+def save_model(model, path=MODEL_PATH):
+    # write-then-rename so a concurrent load never sees a partial pickle
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp,'wb') as f: pickle.dump(model,f)
+    os.replace(tmp, path)
+
 def train_and_save():
     X,y = gen()
     Xtr,Xte,ytr,yte = train_test_split(X,y,test_size=0.25,random_state=42,stratify=y)
-    pipe = Pipeline([('sc',StandardScaler()),('dt',DecisionTreeClassifier(max_depth=6,random_state=42))])
+    pipe = new_pipeline()
     pipe.fit(Xtr,ytr)
-    with open(MODEL_PATH,'wb') as f: pickle.dump(pipe,f)
+    save_model(pipe)
 
 def load_model():
     if not os.path.exists(MODEL_PATH):
@@ -0,0 +1,232 @@
+# app/online_learning.py
+# Online updates of the modulation policy from live link outcomes.
+#
+#   LinkLog     compact rotating binary log, one LOG_DTYPE record per frame:
+#               features at send time, scheme chosen, model version, and the
+#               measured outcome (channel BER over the frame's nbits)
+#   PolicySlot  holds the live model. Senders read slot.model once per frame;
+#               a swap is a single reference assignment, so the send path
+#               never takes a lock or waits for training.
+#   retrain()   relabels logged conditions by what was actually measured,
+#               fits a candidate, validates it against the live model on the
+#               newest records and swaps it in (and onto disk) if it gains
+#               at least RETRAIN_MARGIN.
+#
+# Throughput is tracked as goodput in bits/symbol: bits_per_symbol(scheme)
+# for frames whose BER met BER_TARGET, 0 otherwise. Every retrain appends
+# the validation scores and the live goodput per model version to
+# <log dir>/retrain_history.jsonl, so before/after a swap can be compared.
+import glob, json, os, struct, threading, time
+import numpy as np
+
+from .ml_model import gen, new_pipeline, save_model, ber_bpsk, ber_qpsk, ber_16qam
+
+SCHEMES = ["BPSK", "QPSK", "16QAM"]
+BITS_PER_SYMBOL = np.array([1, 2, 4])
+BER_TARGET = 1e-3             # same rule the synthetic labels use (ml_model.gen)
+
+LOG_MAX_BYTES = 4 << 20       # per file before rotating
+LOG_KEEP = 8                  # files kept per writer; oldest are deleted
+LOG_FLUSH_EVERY = 64
+LOG_READ_FILES = 32           # newest files (any writer) read for retraining
+
+RETRAIN_INTERVAL = 60.0       # seconds between retrain attempts
+RETRAIN_MIN_RECORDS = 200
+SNR_BIN_DB = 1.0              # conditions are pooled per SNR bin for labeling
+MIN_BIN_SAMPLES = 5           # below this a (bin, scheme) cell falls back to theory
+SYNTHETIC_PRIOR = 2000        # synthetic samples mixed in to cover unseen conditions
+RETRAIN_MARGIN = 0.01         # bits/symbol a candidate must gain to replace the live model
+
+LOG_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("snr_db", "<f4"), ("delay_ms", "<f4"), ("jitter_ms", "<f4"), ("recent_ber", "<f4"),
+    ("ber", "<f4"),           # measured outcome
+    ("nbits", "<u4"),
+    ("version", "<u2"),       # PolicySlot version that chose the scheme
+    ("scheme", "u1"),         # index into SCHEMES
+])
+_REC = struct.Struct("<dfffffIHB")
+assert _REC.size == LOG_DTYPE.itemsize
+
+# -------------------------------
+# Rotating link log
+# -------------------------------
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+class LinkLog:
+    def __init__(self, dirpath: str, max_bytes: int = LOG_MAX_BYTES, keep: int = LOG_KEEP):
+        self.dir = dirpath
+        self.max_bytes = max_bytes
+        self.keep = keep
+        # one writer per process: file names carry the pid so uvicorn workers
+        # sharing the directory never interleave records
+        self._prefix = os.path.join(dirpath, f"link-{os.getpid()}-")
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._f = None
+        self._pending = 0
+        os.makedirs(dirpath, exist_ok=True)
+
+    def _open_next(self):
+        if self._f:
+            self._f.close()
+        self._seq += 1
+        self._f = open(f"{self._prefix}{self._seq:06d}.log", "ab")
+        mine = sorted(glob.glob(self._prefix + "*.log"))
+        for old in mine[:-self.keep]:
+            os.remove(old)
+
+    def record(self, snr_db, delay_ms, jitter_ms, recent_ber, scheme: str, ber: float, nbits: int,
+               version: int = 0, t: float = None):
+        rec = _REC.pack(time.time() if t is None else t, snr_db, delay_ms, jitter_ms, recent_ber,
+                        ber, nbits, version & 0xFFFF, SCHEMES.index(scheme))
+        with self._lock:
+            if self._f is None or self._f.tell() >= self.max_bytes:
+                self._open_next()
+            self._f.write(rec)
+            self._pending += 1
+            if self._pending >= LOG_FLUSH_EVERY:
+                self._f.flush()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._f:
+                self._f.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._f:
+                self._f.close()
+                self._f = None
+
+    def read(self) -> np.ndarray:
+        # newest files of every writer (past processes included), oldest record first
+        self.flush()
+        parts = []
+        paths = sorted(glob.glob(os.path.join(self.dir, "link-*.log")), key=_mtime)[-LOG_READ_FILES:]
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    buf = f.read()
+            except FileNotFoundError:
+                continue  # rotated away by its writer meanwhile
+            parts.append(np.frombuffer(buf, LOG_DTYPE, count=len(buf) // LOG_DTYPE.itemsize))
+        if not parts:
+            return np.zeros(0, LOG_DTYPE)
+        rec = np.concatenate(parts)
+        return rec[np.argsort(rec["t"], kind="stable")]
+
+# -------------------------------
+# Live model holder
+# -------------------------------
+class PolicySlot:
+    def __init__(self, model, version: int = 0):
+        self._current = (version, model)
+        self._lock = threading.Lock()   # serializes swaps, never taken by readers
+
+    @property
+    def model(self):
+        return self._current[1]
+
+    def current(self):
+        # (version, model) as one consistent pair
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current[0]
+
+    def swap(self, model) -> int:
+        with self._lock:
+            version = self._current[0] + 1
+            self._current = (version, model)
+            return version
+
+# -------------------------------
+# Labeling / validation
+# -------------------------------
+def features(rec: np.ndarray) -> np.ndarray:
+    return np.column_stack([rec["snr_db"], rec["delay_ms"], rec["jitter_ms"], rec["recent_ber"]]).astype(float)
+
+def _theory_ber(snr_db: float, s: int) -> float:
+    return (ber_bpsk, ber_qpsk, ber_16qam)[s](snr_db)
+
+def outcome_table(rec: np.ndarray):
+    # bit-weighted measured BER per (SNR bin, scheme); NaN where too few samples
+    bins = np.floor(rec["snr_db"] / SNR_BIN_DB).astype(int)
+    lo, hi = (bins.min(), bins.max()) if len(rec) else (0, 0)
+    shape = (hi - lo + 1, len(SCHEMES))
+    err = np.zeros(shape); nbits = np.zeros(shape); n = np.zeros(shape)
+    w = rec["nbits"].astype(float)
+    np.add.at(err, (bins - lo, rec["scheme"]), rec["ber"] * w)
+    np.add.at(nbits, (bins - lo, rec["scheme"]), w)
+    np.add.at(n, (bins - lo, rec["scheme"]), 1)
+    table = np.where(n >= MIN_BIN_SAMPLES, err / np.maximum(nbits, 1), np.nan)
+    # fill the gaps with theory at the bin centre
+    for b in range(shape[0]):
+        centre = (lo + b + 0.5) * SNR_BIN_DB
+        for s in range(len(SCHEMES)):
+            if np.isnan(table[b, s]):
+                table[b, s] = _theory_ber(centre, s)
+    return lo, table
+
+def _lookup(snr_db: np.ndarray, lo: int, table: np.ndarray) -> np.ndarray:
+    b = np.clip(np.floor(snr_db / SNR_BIN_DB).astype(int) - lo, 0, len(table) - 1)
+    return table[b]                                   # (n, n_schemes)
+
+def best_labels(snr_db: np.ndarray, lo: int, table: np.ndarray) -> np.ndarray:
+    # highest-order scheme meeting BER_TARGET in that bin (BPSK if none does)
+    ok = _lookup(snr_db, lo, table) < BER_TARGET
+    return np.where(ok[:, 2], 2, np.where(ok[:, 1], 1, 0))
+
+def expected_goodput(model, X: np.ndarray, lo: int, table: np.ndarray) -> float:
+    choice = model.predict(X).astype(int)
+    ber = _lookup(X[:, 0], lo, table)[np.arange(len(X)), choice]
+    return float(np.mean(np.where(ber < BER_TARGET, BITS_PER_SYMBOL[choice], 0)))
+
+def live_goodput(rec: np.ndarray) -> dict:
+    # measured bits/symbol per model version, from what was actually sent
+    out = {}
+    for v in np.unique(rec["version"]):
+        r = rec[rec["version"] == v]
+        g = np.where(r["ber"] < BER_TARGET, BITS_PER_SYMBOL[r["scheme"]], 0)
+        out[int(v)] = {"frames": len(r), "goodput": round(float(g.mean()), 4)}
+    return out
+
+# -------------------------------
+# Retraining
+# -------------------------------
+def retrain(log: LinkLog, slot: PolicySlot, model_path: str = None, margin: float = RETRAIN_MARGIN) -> dict:
+    rec = log.read()
+    entry = {"t": time.time(), "records": len(rec), "version": slot.version}
+    if len(rec) < RETRAIN_MIN_RECORDS:
+        entry["skipped"] = f"fewer than {RETRAIN_MIN_RECORDS} records"
+        return entry
+
+    lo, table = outcome_table(rec)
+    X = features(rec)
+    y = best_labels(X[:, 0], lo, table)
+    # validate on the newest quarter: the policy has to do well on current conditions
+    split = int(len(rec) * 0.75)
+    Xs, ys = gen(SYNTHETIC_PRIOR)
+    candidate = new_pipeline().fit(np.vstack([Xs, X[:split]]), np.concatenate([ys, y[:split]]))
+
+    live = slot.model
+    entry["val_goodput_live"] = expected_goodput(live, X[split:], lo, table)
+    entry["val_goodput_candidate"] = expected_goodput(candidate, X[split:], lo, table)
+    entry["live_goodput_by_version"] = live_goodput(rec)
+    entry["swapped"] = entry["val_goodput_candidate"] >= entry["val_goodput_live"] + margin
+    if entry["swapped"]:
+        if model_path:
+            save_model(candidate, model_path)
+        entry["new_version"] = slot.swap(candidate)
+
+    with open(os.path.join(log.dir, "retrain_history.jsonl"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
@@ -0,0 +1,64 @@
+# app/profiler.py
+# Optional sampling profiler for the event-loop thread. Off by default;
+# with ENABLE_PROFILER=1, server.py toggles it at runtime via
+# /debug/profiler. A daemon thread snapshots the target thread's stack
+# every `interval` seconds and counts collapsed stacks ("a;b;c N",
+# flamegraph.pl / speedscope format).
+import sys, threading
+from collections import Counter
+
+MAX_STACKS = 5000     # distinct stacks kept; the rest are counted as "<other>"
+MAX_DEPTH = 64
+
+class SamplingProfiler:
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.interval = 0.005
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, target_thread_id: int = None):
+        if self.running:
+            return
+        self.interval = max(interval, 0.001)
+        self._target = target_thread_id or threading.main_thread().ident
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def reset(self):
+        self.counts.clear()
+        self.samples = 0
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            if key not in self.counts and len(self.counts) >= MAX_STACKS:
+                key = "<other>"
+            self.counts[key] += 1
+            self.samples += 1
+
+    def collapsed(self, top: int = None) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common(top))
+
+profiler = SamplingProfiler()
@@ -0,0 +1,273 @@
+# app/pulse_shaping.py
+from functools import lru_cache
+import numpy as np
+
+# Defaults for the demo link: 4 samples/symbol, RRC spanning 8 symbols each side
+SPS = 4
+SPAN = 8
+ROLLOFF = 0.35
+
+# -------------------------------
+# Root-raised-cosine taps
+# -------------------------------
+@lru_cache(maxsize=16)
+def rrc_taps(sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF) -> np.ndarray:
+    # 2*span*sps + 1 taps, normalized to unit energy so TX+RX filtering
+    # gives a raised-cosine with unit gain at the symbol instants.
+    # Cached per (sps, span, beta); the returned array is read-only.
+    t = np.arange(-span*sps, span*sps + 1, dtype=float) / sps
+    h = np.empty_like(t)
+    for i, ti in enumerate(t):
+        if ti == 0.0:
+            h[i] = 1.0 - beta + 4*beta/np.pi
+        elif beta > 0 and abs(abs(ti) - 1/(4*beta)) < 1e-12:
+            h[i] = (beta/np.sqrt(2)) * ((1 + 2/np.pi)*np.sin(np.pi/(4*beta))
+                                        + (1 - 2/np.pi)*np.cos(np.pi/(4*beta)))
+        else:
+            num = np.sin(np.pi*ti*(1 - beta)) + 4*beta*ti*np.cos(np.pi*ti*(1 + beta))
+            den = np.pi*ti*(1 - (4*beta*ti)**2)
+            h[i] = num / den
+    h /= np.sqrt(np.sum(h**2))
+    h.flags.writeable = False
+    return h
+
+def _polyphase(taps: np.ndarray, sps: int) -> np.ndarray:
+    # (sps, ceil(ntaps/sps)) branch filters: row p is taps[p::sps], zero-padded
+    ntaps = len(taps)
+    padded = np.zeros(-(-ntaps // sps)*sps)
+    padded[:ntaps] = taps
+    return padded.reshape(-1, sps).T.copy()
+
+def _fir_valid(x: np.ndarray, taps: np.ndarray) -> np.ndarray:
+    # np.convolve(..., "valid") along the last axis, leading axes are rows.
+    # Real taps: complex input is filtered as two real rows.
+    rows = x.reshape(-1, x.shape[-1])
+    out = np.empty((rows.shape[0], x.shape[-1] - len(taps) + 1), dtype=np.result_type(x, float))
+    for r, row in zip(out, rows):
+        if np.iscomplexobj(row):
+            r.real = np.convolve(row.real, taps, "valid")
+            r.imag = np.convolve(row.imag, taps, "valid")
+        else:
+            r[:] = np.convolve(row, taps, "valid")
+    return out.reshape(x.shape[:-1] + out.shape[-1:])
+
+# -------------------------------
+# Streaming overlap-save FFT convolution
+# -------------------------------
+def _next_pow2(n: int) -> int:
+    return 1 << (int(n) - 1).bit_length()
+
+@lru_cache(maxsize=16)
+def _spectra(taps_key: bytes, nfft: int):
+    taps = np.frombuffer(taps_key)
+    return np.fft.fft(taps, nfft), np.fft.rfft(taps, nfft)
+
+class OverlapSaveFilter:
+    # FIR filter applied with overlap-save. Keeps the last (ntaps-1) input
+    # samples between calls so consecutive frames filter as one stream.
+    # Works along the last axis; leading axes are independent batch rows.
+    # Segments are transformed `seg_batch` at a time so the FFT working set
+    # stays cache-sized however long the input is.
+    def __init__(self, taps: np.ndarray, fft_size: int = None, seg_batch: int = 32):
+        self.taps = np.asarray(taps, dtype=float)
+        self.ntaps = len(self.taps)
+        if fft_size is None:
+            fft_size = max(256, _next_pow2(4*self.ntaps))
+        if fft_size < self.ntaps:
+            raise ValueError("fft_size must be >= number of taps")
+        self.nfft = fft_size
+        self.hop = fft_size - self.ntaps + 1
+        self._H, self._Hr = _spectra(self.taps.tobytes(), self.nfft)
+        self.seg_batch = seg_batch
+        self._state = None
+
+    def reset(self):
+        self._state = None
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x)
+        n = x.shape[-1]
+        lead = x.shape[:-1]
+        is_complex = np.iscomplexobj(x)
+        dtype = np.complex128 if is_complex else np.float64
+        if self._state is None or self._state.shape[:-1] != lead:
+            self._state = np.zeros(lead + (self.ntaps - 1,), dtype=dtype)
+        elif is_complex and not np.iscomplexobj(self._state):
+            self._state = self._state.astype(np.complex128)
+
+        nseg = -(-n // self.hop) if n else 0
+        buf = np.zeros(lead + (self.ntaps - 1 + nseg*self.hop,), dtype=np.result_type(dtype, self._state.dtype))
+        buf[..., :self.ntaps - 1] = self._state
+        buf[..., self.ntaps - 1:self.ntaps - 1 + n] = x
+        # carry the tail forward before buf is reused for output
+        self._state = buf[..., n:n + self.ntaps - 1].copy()
+        if n == 0:
+            return np.zeros(lead + (0,), dtype=buf.dtype)
+
+        # (..., nseg, nfft) view of overlapping segments, hop samples apart
+        segs = np.lib.stride_tricks.sliding_window_view(buf, self.nfft, axis=-1)[..., ::self.hop, :][..., :nseg, :]
+        out = np.empty(lead + (nseg, self.hop), dtype=buf.dtype)
+        for k in range(0, nseg, self.seg_batch):
+            blk = segs[..., k:k + self.seg_batch, :]
+            if np.iscomplexobj(buf):
+                y = np.fft.ifft(np.fft.fft(blk, axis=-1) * self._H, axis=-1)
+            else:
+                y = np.fft.irfft(np.fft.rfft(blk, axis=-1) * self._Hr, n=self.nfft, axis=-1)
+            out[..., k:k + self.seg_batch, :] = y[..., self.ntaps - 1:]
+        return out.reshape(lead + (nseg*self.hop,))[..., :n]
+
+# -------------------------------
+# TX pulse shaper / RX matched filter (polyphase)
+# -------------------------------
+def upsample(symbols: np.ndarray, sps: int) -> np.ndarray:
+    symbols = np.asarray(symbols)
+    out = np.zeros(symbols.shape[:-1] + (symbols.shape[-1]*sps,), dtype=np.result_type(symbols, float))
+    out[..., ::sps] = symbols
+    return out
+
+class PulseShaper:
+    # Interpolate to sps samples/symbol through the RRC taps. Polyphase: output
+    # phase p is the symbol stream filtered by taps[p::sps], so nothing is
+    # zero-stuffed and every multiply hits a real symbol. Same output as
+    # filtering upsample(symbols, sps) with the full taps.
+    def __init__(self, sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF):
+        self.sps = sps
+        self.taps = rrc_taps(sps, span, beta)
+        self.branches = _polyphase(self.taps, sps)
+        self._hist = None
+
+    def reset(self):
+        self._hist = None
+
+    def process(self, symbols: np.ndarray) -> np.ndarray:
+        symbols = np.asarray(symbols)
+        lead, n = symbols.shape[:-1], symbols.shape[-1]
+        nhist = self.branches.shape[1] - 1
+        if self._hist is None or self._hist.shape[:-1] != lead:
+            self._hist = np.zeros(lead + (nhist,))
+        buf = np.concatenate([self._hist, symbols], axis=-1).astype(np.result_type(self._hist, symbols, float), copy=False)
+        self._hist = buf[..., n:]
+        out = np.empty(lead + (n*self.sps,), dtype=buf.dtype)
+        if n:
+            for p, taps in enumerate(self.branches):
+                out[..., p::self.sps] = _fir_valid(buf, taps)
+        return out
+
+    def flush(self, lead_shape=()) -> np.ndarray:
+        # push out the filter tail (ntaps-1 samples)
+        tail = len(self.taps) - 1
+        return self.process(np.zeros(tuple(lead_shape) + (-(-tail // self.sps),)))[..., :tail]
+
+class MatchedFilter:
+    # RRC matched filter + decimation back to one sample per symbol.
+    # Polyphase decimation: only the symbol-instant outputs are computed, each
+    # as the sum over phases p of the input's p-th polyphase stream filtered
+    # by taps[p::sps]. The decimation phase is tracked across calls, so frames
+    # may be split anywhere. `delay` is the number of leading samples before
+    # the first symbol peak (TX + RX group delay for a back-to-back link).
+    def __init__(self, sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF, delay: int = None):
+        self.sps = sps
+        self.taps = rrc_taps(sps, span, beta)
+        self.branches = _polyphase(self.taps, sps)
+        self.delay = len(self.taps) - 1 if delay is None else delay
+        self._hist = None
+        self._pos = 0
+
+    def reset(self):
+        self._hist = None
+        self._pos = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples)
+        lead, n = samples.shape[:-1], samples.shape[-1]
+        nb = self.branches.shape[1]
+        nhist = nb*self.sps
+        if self._hist is None or self._hist.shape[:-1] != lead:
+            self._hist = np.zeros(lead + (nhist,))
+        # buf[i] is absolute sample pos - nhist + i
+        buf = np.concatenate([self._hist, samples], axis=-1).astype(np.result_type(self._hist, samples, float), copy=False)
+        first = self.delay if self._pos <= self.delay else self._pos + (self.delay - self._pos) % self.sps
+        nout = max(0, -(-(self._pos + n - first) // self.sps))
+        i0 = first - self._pos + nhist
+        self._hist = buf[..., n:]
+        self._pos += n
+        y = np.zeros(lead + (nout,), dtype=buf.dtype)
+        if nout:
+            for p, taps in enumerate(self.branches):
+                s = i0 - p - (nb - 1)*self.sps
+                y += _fir_valid(buf[..., s:s + (nout + nb - 1)*self.sps:self.sps], taps)
+        return y
+
+def pulse_shape(I: np.ndarray, Q: np.ndarray, sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF):
+    # One-shot shaped waveform (including the filter tail) for previews
+    sh = PulseShaper(sps, span, beta)
+    x = np.concatenate([sh.process(I + 1j*Q), sh.flush()])
+    return x.real, x.imag
+
+@lru_cache(maxsize=16)
+def _link_response(sps: int, span: int, beta: float):
+    # Back-to-back TX RRC -> RX matched filter seen at the symbol instants.
+    # Composing the shaper's and the matched filter's polyphase branches
+    # leaves a symbol-spaced filter: the raised cosine sampled every sps
+    # samples around its peak (unit centre tap, small truncation ISI).
+    # White sample-level noise through the matched filter has the same
+    # autocorrelation at the symbol instants (sigma^2 * rc), so it is drawn
+    # at symbol rate through `shape`, the minimum-phase spectral factor of
+    # rc (shape * reversed(shape) == rc), found once via the cepstrum.
+    h = rrc_taps(sps, span, beta)
+    rc = np.convolve(h, h)[::sps]   # symmetric, centre = 1
+    m = len(rc) // 2
+    nfft = _next_pow2(64*len(rc))
+    circ = np.zeros(nfft)
+    circ[:m + 1] = rc[m:]
+    circ[-m:] = rc[:m]
+    cep = np.fft.irfft(0.5*np.log(np.fft.rfft(circ).real), nfft)
+    cep[1:nfft//2] *= 2
+    cep[nfft//2 + 1:] = 0
+    shape = np.fft.irfft(np.exp(np.fft.rfft(cep)), nfft)[:m + 1]
+    rc.flags.writeable = False
+    shape.flags.writeable = False
+    return rc, shape
+
+def waveform_channel(I: np.ndarray, Q: np.ndarray, snr_db: float, *,
+                     sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF,
+                     block_syms: int = 1 << 16):
+    # TX RRC -> sample-level AWGN -> RX matched filter -> symbol decisions input,
+    # computed only at the symbol instants (see _link_response): the symbols
+    # go through the composed TX/RX response and the noise is the matched-
+    # filtered sample noise in distribution. Per-sample sigma is the
+    # symbol-level one, so Es/N0 matches channel.add_awgn. Output is
+    # preallocated and filled in blocks, so extra memory stays per-block.
+    snr_lin = 10**(snr_db/10.0)
+    sigma = np.sqrt(0.5 / max(snr_lin, 1e-6))
+    rng = np.random.default_rng()
+    rc, shape = _link_response(sps, span, beta)
+    m, nsh = len(rc) // 2, len(shape)
+    nsym = len(I)
+    outI, outQ = np.empty(nsym), np.empty(nsym)
+    hist = rng.standard_normal((2, nsh - 1))   # noise is stationary from the first symbol
+    for s in range(0, nsym, block_syms):
+        e = min(s + block_syms, nsym)
+        lo, hi = max(0, s - m), min(nsym, e + m)
+        w = np.concatenate([hist, rng.standard_normal((2, e - s))], axis=1)
+        hist = w[:, e - s:]
+        for src, dst, wn in ((I, outI, w[0]), (Q, outQ, w[1])):
+            seg = np.asarray(src[lo:hi], float)
+            seg = np.pad(seg, (m - (s - lo), m - (hi - e)))
+            dst[s:e] = np.convolve(seg, rc, "valid")
+            dst[s:e] += sigma*np.convolve(wn, shape, "valid")
+    return outI, outQ
+
+def waveform_preview(I: np.ndarray, Q: np.ndarray, snr_db: float = None, *,
+                     max_samples: int = 256, sps: int = SPS, span: int = SPAN, beta: float = ROLLOFF):
+    # Shaped waveform for the first few symbols, sized so the preview plus the
+    # filter tail fits in max_samples. With snr_db, adds the same sample-level
+    # noise as waveform_channel (i.e. what the RX front end sees).
+    nsym = max(1, max_samples//sps - 2*span)
+    wI, wQ = pulse_shape(np.asarray(I[:nsym], float), np.asarray(Q[:nsym], float), sps, span, beta)
+    if snr_db is not None:
+        sigma = np.sqrt(0.5 / max(10**(snr_db/10.0), 1e-6))
+        rng = np.random.default_rng()
+        wI = wI + rng.normal(0, sigma, size=wI.shape)
+        wQ = wQ + rng.normal(0, sigma, size=wQ.shape)
+    return wI, wQ
@@ -0,0 +1,320 @@
+# app/room_backend.py
+# Room state + message routing behind one small interface, so the server can
+# run as a single process (InMemoryBackend) or as several uvicorn workers
+# sharing rooms through the Unix-socket hub in app/hub.py (HubBackend).
+#
+# Select with ROOM_BACKEND=memory (default) or ROOM_BACKEND=hub.
+import asyncio, itertools, os, time
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+from .artifacts import frame_owner
+from .fanout import Subscriber, broadcast, encode
+from .hub import HUB_SOCKET, pack_msg, read_msg
+
+DEFAULT_SNR = 8.0
+# Only `join` creates rooms. Rooms with no sockets are evicted after
+# ROOM_IDLE_TTL seconds; MAX_ROOMS caps how many may exist at once.
+MAX_ROOMS = 10_000
+ROOM_IDLE_TTL = 300.0
+ROOM_GC_INTERVAL = 30.0
+# HubBackend: how long join waits for the room's SNR, and get_preview for
+# another worker's artifacts, before answering with what it has
+HUB_JOIN_TIMEOUT = 1.0
+PREVIEW_FETCH_TIMEOUT = 2.0
+
+metrics.counter("rooms_created_total", "Rooms created by join")
+metrics.counter("rooms_evicted_total", "Idle rooms removed by the sweeper")
+metrics.counter("rooms_rejected_total", "Joins refused because MAX_ROOMS was reached")
+
+class RoomsFull(Exception):
+    pass
+
+class InMemoryBackend:
+    # room_id -> {"tx": {Subscriber}, "rx": {Subscriber}, "snr": float, "last_active": monotonic}
+    def __init__(self):
+        self.rooms: Dict[str, Dict[str, Any]] = {}
+        self._gc_task = None
+        # frame_id -> encoded frame_artifacts message, or None if not held here
+        self.preview_source: Optional[Callable[[str], Optional[str]]] = None
+
+    async def start(self):
+        self._gc_task = asyncio.create_task(self._gc_loop())
+
+    async def stop(self):
+        if self._gc_task:
+            self._gc_task.cancel()
+
+    async def _gc_loop(self):
+        while True:
+            await asyncio.sleep(ROOM_GC_INTERVAL)
+            await self.sweep()
+
+    async def sweep(self, now: float = None) -> int:
+        now = time.monotonic() if now is None else now
+        idle = [rid for rid, room in self.rooms.items()
+                if not (room["tx"] or room["rx"]) and now - room["last_active"] > ROOM_IDLE_TTL]
+        for rid in idle:
+            del self.rooms[rid]
+        if idle:
+            metrics.inc("rooms_evicted_total", len(idle))
+        return len(idle)
+
+    def _create_room(self, room_id: str):
+        if len(self.rooms) >= MAX_ROOMS:
+            metrics.inc("rooms_rejected_total")
+            raise RoomsFull(f"room limit ({MAX_ROOMS}) reached")
+        metrics.inc("rooms_created_total")
+        room = self.rooms[room_id] = {"tx": set(), "rx": set(), "snr": DEFAULT_SNR,
+                                      "last_active": time.monotonic()}
+        return room
+
+    def get_snr(self, room_id: str) -> float:
+        room = self.rooms.get(room_id)
+        return room["snr"] if room else DEFAULT_SNR
+
+    async def join(self, room_id: str, role: str, sub: Subscriber) -> float:
+        room = self.rooms.get(room_id) or self._create_room(room_id)
+        room[role].add(sub)
+        room["last_active"] = time.monotonic()
+        return room["snr"]
+
+    async def leave(self, room_id: str, role: str, sub: Subscriber):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            room[role].discard(sub)
+            room["last_active"] = time.monotonic()
+
+    async def set_previews(self, room_id: Optional[str], sub: Subscriber, on: bool):
+        # page shows charts (or stopped); room_id is None before it joins
+        sub.previews = on
+
+    async def fetch_preview(self, frame_id: str) -> Optional[str]:
+        # artifacts this process does not hold; single process: nobody else has them
+        return None
+
+    async def set_snr(self, room_id: str, snr: float):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        room["snr"] = snr
+        self.deliver(room_id, "*", encode({"type": "snr_update", "snr": snr}))
+
+    async def publish(self, room_id: str, role: str, text: str):
+        # role: "tx", "rx" or "*" for both
+        self.deliver(room_id, role, text)
+
+    def _has_viewers(self, room) -> bool:
+        return any(s.previews for s in (*room["tx"], *room["rx"]))
+
+    def preview_due(self, room_id: str, min_interval: float) -> bool:
+        # Should this frame get preview artifacts? Only if a page in the room
+        # is showing charts, and at most once per min_interval per room.
+        room = self.rooms.get(room_id)
+        if room is None or not self._has_viewers(room):
+            return False
+        now = time.monotonic()
+        if now - room.get("last_preview", 0.0) < min_interval:
+            return False
+        room["last_preview"] = now
+        return True
+
+    def deliver(self, room_id: str, role: str, text: str) -> int:
+        room = self.rooms.get(room_id)
+        if room is None:
+            return 0
+        room["last_active"] = time.monotonic()
+        subs = room["tx"] | room["rx"] if role == "*" else room[role]
+        return broadcast(subs, text)
+
+    def stats(self) -> Dict[str, float]:
+        # memory accounting for /metrics
+        subs = [s for room in self.rooms.values() for s in (*room["tx"], *room["rx"])]
+        return {
+            "rooms": len(self.rooms),
+            "rooms_empty": sum(1 for r in self.rooms.values() if not (r["tx"] or r["rx"])),
+            "subscribers": len(subs),
+            "queued_messages": sum(s.queue.qsize() for s in subs),
+            "queued_bytes": sum(s.queued_bytes for s in subs),
+        }
+
+class HubBackend(InMemoryBackend):
+    # Local subscribers as above; publishes and SNR changes are mirrored to
+    # the other workers through the hub, and theirs are delivered here.
+    # Viewer counts go through the hub too, so preview_due sees pages on
+    # every worker, and get_preview for another worker's frame is answered
+    # by that worker's ArtifactCache.
+    def __init__(self, path: str = HUB_SOCKET):
+        super().__init__()
+        self.path = path
+        self._writer = None
+        self._task = None
+        self._connected = asyncio.Event()
+        self._joins: Dict[str, asyncio.Future] = {}     # room_id -> hub's "joined" reply
+        self._fetches: Dict[int, asyncio.Future] = {}   # req -> another worker's preview
+        self._reqs = itertools.count(1)
+
+    async def start(self):
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), 10)
+
+    async def stop(self):
+        await super().stop()
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+
+    async def _run(self):
+        delay = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay*2, 5.0)
+                continue
+            delay = 0.1
+            self._writer = writer
+            writer.write(pack_msg({"op": "hello", "pid": os.getpid()}))
+            # (re)subscribe to every room with local sockets
+            for room_id, room in self.rooms.items():
+                if room["tx"] or room["rx"]:
+                    room["viewers_sent"] = self._local_viewers(room)
+                    writer.write(pack_msg({"op": "sub", "room": room_id}))
+                    writer.write(pack_msg({"op": "viewers", "room": room_id, "n": room["viewers_sent"]}))
+            self._connected.set()
+            try:
+                while True:
+                    header, body = await read_msg(reader)
+                    self._on_hub(header, body)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            self._writer = None
+            self._connected.clear()
+            # nothing pending will be answered on this connection
+            for fut in (*self._joins.values(), *self._fetches.values()):
+                if not fut.done():
+                    fut.set_result(None)
+            self._joins.clear()
+
+    def _on_hub(self, header: dict, body: bytes):
+        op = header["op"]
+        if op in ("snr", "joined"):
+            # "joined" answers our "sub" with the room's SNR (None if the hub
+            # has none yet) and the other workers' viewers; "snr" is a change
+            room = self.rooms.get(header["room"])
+            if room is not None and header["snr"] is not None and room["snr"] != header["snr"]:
+                room["snr"] = header["snr"]
+                self.deliver(header["room"], "*", encode({"type": "snr_update", "snr": room["snr"]}))
+            if op == "joined":
+                if room is not None:
+                    room["remote_viewers"] = header["viewers"]
+                fut = self._joins.pop(header["room"], None)
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
+        elif op == "viewers":
+            room = self.rooms.get(header["room"])
+            if room is not None:
+                room["remote_viewers"] = header["n"]
+        elif op == "get_preview":
+            text = self.preview_source(header["frame_id"]) if self.preview_source else None
+            if self._writer is not None:
+                self._writer.write(pack_msg({"op": "preview", "dst": header["src"], "req": header["req"]},
+                                            text.encode("utf-8") if text else b""))
+        elif op == "preview":
+            fut = self._fetches.get(header["req"])
+            if fut is not None and not fut.done():
+                fut.set_result(body.decode("utf-8") if body else None)
+        elif op == "pub":
+            self.deliver(header["room"], header["role"], body.decode("utf-8"))
+
+    async def _to_hub(self, data: bytes):
+        w = self._writer
+        if w is None:
+            return  # hub down: keep serving local sockets, resync on reconnect
+        w.write(data)
+        await w.drain()
+
+    async def join(self, room_id: str, role: str, sub: Subscriber) -> float:
+        # returns the room's SNR as the hub has it: the first local join
+        # waits (up to HUB_JOIN_TIMEOUT) for the reply to its "sub", later
+        # ones for the same pending reply; a late reply still reaches the
+        # page as snr_update
+        room = self.rooms.get(room_id)
+        first = room is None or not (room["tx"] or room["rx"])
+        await super().join(room_id, role, sub)
+        if first and self._writer is not None:
+            self._joins[room_id] = asyncio.get_running_loop().create_future()
+            await self._to_hub(pack_msg({"op": "sub", "room": room_id}))
+        await self._report_viewers(room_id)
+        fut = self._joins.get(room_id)
+        if fut is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), HUB_JOIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        return self.get_snr(room_id)
+
+    async def leave(self, room_id: str, role: str, sub: Subscriber):
+        await super().leave(room_id, role, sub)
+        room = self.rooms.get(room_id)
+        if room is not None and not (room["tx"] or room["rx"]):
+            room["viewers_sent"] = 0   # the hub drops our count on unsub
+            await self._to_hub(pack_msg({"op": "unsub", "room": room_id}))
+        else:
+            await self._report_viewers(room_id)
+
+    async def set_previews(self, room_id: Optional[str], sub: Subscriber, on: bool):
+        await super().set_previews(room_id, sub, on)
+        if room_id is not None:
+            await self._report_viewers(room_id)
+
+    def _local_viewers(self, room) -> int:
+        return sum(1 for s in (*room["tx"], *room["rx"]) if s.previews)
+
+    async def _report_viewers(self, room_id: str):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        n = self._local_viewers(room)
+        if n != room.get("viewers_sent", 0):
+            room["viewers_sent"] = n   # resent for every room on reconnect
+            await self._to_hub(pack_msg({"op": "viewers", "room": room_id, "n": n}))
+
+    async def fetch_preview(self, frame_id: str) -> Optional[str]:
+        owner = frame_owner(frame_id)
+        if owner is None or owner == os.getpid() or self._writer is None:
+            return None
+        req = next(self._reqs)
+        fut = self._fetches[req] = asyncio.get_running_loop().create_future()
+        try:
+            await self._to_hub(pack_msg({"op": "get_preview", "pid": owner, "frame_id": frame_id, "req": req}))
+            return await asyncio.wait_for(fut, PREVIEW_FETCH_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._fetches.pop(req, None)
+
+    async def set_snr(self, room_id: str, snr: float):
+        if room_id not in self.rooms:
+            return
+        await super().set_snr(room_id, snr)
+        await self._to_hub(pack_msg({"op": "snr", "room": room_id, "snr": snr}))
+
+    def _has_viewers(self, room) -> bool:
+        # local pages, or the other workers' count as last pushed by the hub
+        return super()._has_viewers(room) or room.get("remote_viewers", 0) > 0
+
+    async def publish(self, room_id: str, role: str, text: str):
+        self.deliver(room_id, role, text)
+        await self._to_hub(pack_msg({"op": "pub", "room": room_id, "role": role}, text.encode("utf-8")))
+
+def make_backend(kind: str = None):
+    kind = kind or os.environ.get("ROOM_BACKEND", "memory")
+    if kind == "memory":
+        return InMemoryBackend()
+    if kind == "hub":
+        return HubBackend()
+    raise ValueError(f"unknown ROOM_BACKEND {kind!r} (expected 'memory' or 'hub')")
@@ -0,0 +1,83 @@
+# app/segments.py
+# Segmented AES-GCM + rep3 FEC for large payloads, run on a thread pool.
+#
+# The plaintext is cut into SEGMENT_SIZE pieces. Segment i is sealed with
+# its own nonce (base IV with the low 32 bits XORed with i) and its own tag,
+# and the segment index/count go into the AAD so segments cannot be
+# reordered, dropped or spliced between frames. Each pool task seals one
+# segment and rep3-encodes it; results are joined in segment order.
+#
+#   ct      = seal(seg 0) || seal(seg 1) || ...      each = ciphertext + 16-byte tag
+#   fec_ct  = rep3(seal(seg 0)) || rep3(seal(seg 1)) || ...
+#
+# rep3 is bit-local, so fec_ct is byte-for-byte what rep3_encode(ct) gives;
+# the channel and charts see no difference. The receiver needs the base IV
+# and the segment size ("seg" in frame_rx / rx_decrypt) to split and open it.
+# AES-GCM (cryptography) and the NumPy bit ops release the GIL, so segments
+# run truly in parallel.
+import os, struct
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .channel import rep3_encode, rep3_decode
+
+SEGMENT_SIZE = 256 * 1024                # plaintext bytes per segment
+PARALLEL_MIN_BYTES = 1 << 20             # smaller payloads keep the one-shot path
+PIPELINE_THREADS = int(os.environ.get("PIPELINE_THREADS", os.cpu_count() or 1))
+TAG_SIZE = 16
+
+_pool = None
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(PIPELINE_THREADS, thread_name_prefix="segments")
+    return _pool
+
+def _nonce(base_iv: bytes, i: int) -> bytes:
+    return base_iv[:8] + (int.from_bytes(base_iv[8:], "big") ^ i).to_bytes(4, "big")
+
+def _aad(i: int, n: int) -> bytes:
+    return struct.pack("!4sII", b"seg1", i, n)
+
+def _count(nbytes: int, seg_size: int) -> int:
+    return max(1, -(-nbytes // seg_size))
+
+# -------------------------------
+# TX: encrypt + FEC encode
+# -------------------------------
+def seal(plain: bytes, key: bytes, seg_size: int = SEGMENT_SIZE):
+    # -> (base_iv, ct, fec_ct)
+    aes = AESGCM(key)
+    iv = os.urandom(12)
+    n = _count(len(plain), seg_size)
+    view = memoryview(plain)
+
+    def work(i):
+        ct = aes.encrypt(_nonce(iv, i), view[i*seg_size:(i + 1)*seg_size], _aad(i, n))
+        return ct, rep3_encode(ct)
+
+    parts = list(_executor().map(work, range(n)))
+    return iv, b"".join(p[0] for p in parts), b"".join(p[1] for p in parts)
+
+# -------------------------------
+# RX: FEC decode + decrypt
+# -------------------------------
+def open_encoded(encoded: bytes, key: bytes, iv: bytes, seg_size: int):
+    # encoded = rep3 stream as produced by seal() (after the channel).
+    # -> (plaintext or None, number of segments that failed authentication)
+    enc_seg = 3 * (seg_size + TAG_SIZE)
+    n = _count(len(encoded), enc_seg)
+    aes = AESGCM(key)
+    view = memoryview(encoded)
+
+    def work(i):
+        ct = rep3_decode(view[i*enc_seg:(i + 1)*enc_seg])
+        try:
+            return aes.decrypt(_nonce(iv, i), ct, _aad(i, n))
+        except Exception:
+            return None
+
+    parts = list(_executor().map(work, range(n)))
+    bad = sum(p is None for p in parts)
+    return (None if bad else b"".join(parts)), bad
@@ -1,50 +1,219 @@
 # app/server.py
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from typing import Dict, Any
-import base64, json, os
+from contextlib import asynccontextmanager
+import asyncio, base64, json, os, threading
 import numpy as np
 
-from .ml_model import load_model, select_modulation
-from .crypto_utils import encrypt_bytes, decrypt_bytes
+from .ml_model import load_model, select_modulation, MODEL_PATH
+from .crypto_utils import derive_key, new_salt, encrypt_with_key, decrypt_with_key
 # NOTE: theory-based BER + simple FEC (repetition-3) + constellations + bits
 from .channel import (
     ber_for_scheme,
     rep3_encode, rep3_decode,
     bytes_to_bits, bits_to_constellation,
-    add_awgn, demodulate_bits, iq_points, iq_series
+    demodulate_bits
 )
-
-app = FastAPI()
+# RRC pulse shaping: channel noise is applied to the shaped waveform and the
+# matched-filter output feeds demodulate_bits
+from .pulse_shaping import waveform_channel
+# Charts/previews are rendered lazily from a per-process LRU, on request
+# (frames held by another worker are fetched through the room backend)
+from .artifacts import ArtifactCache, FrameArtifacts, next_frame_id, PREVIEW_MIN_INTERVAL
+from .fanout import Subscriber, encode, encode_body, with_type
+from .room_backend import make_backend, RoomsFull
+from .limits import ConnectionLimits, MAX_ROOM_ID_LEN, MAX_FRAME_ID_LEN, MAX_PAYLOAD_BYTES
+from . import metrics
+from .profiler import profiler
+# Large payloads: per-segment AES-GCM + rep3 on a thread pool
+from . import segments
+# TX logs (features, scheme, measured BER) per frame; a background job
+# retrains the policy from that log and hot-swaps it (app/online_learning.py)
+from .online_learning import LinkLog, PolicySlot, retrain, RETRAIN_INTERVAL
+
+# Rooms live behind a backend: in-process by default, or shared between
+# uvicorn workers through app/hub.py with ROOM_BACKEND=hub.
+# Any number of TX/RX pages may share a room; each gets its own send queue.
+backend = make_backend()
+
+LINK_LOG_DIR = os.environ.get("LINK_LOG_DIR", os.path.join(os.path.dirname(__file__), "linklog"))
+# Opt-in: log per-frame outcomes and retrain/hot-swap the policy. Swaps stay
+# in memory; SAVE_RETRAINED=1 also writes each swapped model to MODEL_PATH.
+ONLINE_RETRAIN = os.environ.get("ONLINE_RETRAIN", "0") == "1"
+SAVE_RETRAINED = os.environ.get("SAVE_RETRAINED", "0") == "1"
+# link features the demo feeds the policy (no live delay/jitter/BER feedback here)
+DELAY_MS, JITTER_MS, RECENT_BER = 20, 3, 1e-3
+
+async def retrain_loop():
+    while True:
+        await asyncio.sleep(RETRAIN_INTERVAL)
+        try:
+            # fit/validate off the event loop; the swap itself is one assignment
+            entry = await asyncio.to_thread(retrain, link_log, policy, MODEL_PATH if SAVE_RETRAINED else None)
+        except Exception as e:
+            print(f"[retrain] failed: {e!r}")
+            continue
+        if entry.get("swapped"):
+            metrics.inc("policy_swaps_total")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await backend.start()
+    task = asyncio.create_task(retrain_loop()) if ONLINE_RETRAIN else None
+    yield
+    if task:
+        task.cancel()
+    if link_log:
+        link_log.close()
+    await backend.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# ---- memory accounting (scraped from /metrics) ----
+metrics.counter("ws_messages_rejected_total", "Incoming messages refused by size/rate limits")
+metrics.gauge("rooms_live", "Rooms currently held by this process", lambda: backend.stats()["rooms"])
+metrics.gauge("rooms_empty", "Rooms with no sockets, awaiting idle eviction", lambda: backend.stats()["rooms_empty"])
+metrics.gauge("ws_subscribers", "Websockets joined to a room", lambda: backend.stats()["subscribers"])
+metrics.gauge("ws_send_queue_messages", "Messages waiting in per-connection send queues",
+              lambda: backend.stats()["queued_messages"])
+metrics.gauge("ws_send_queue_bytes", "Bytes waiting in per-connection send queues",
+              lambda: backend.stats()["queued_bytes"])
+metrics.gauge("process_resident_memory_bytes", "Resident set size", metrics.rss_bytes)
+metrics.counter("policy_swaps_total", "Retrained modulation policies swapped in")
+metrics.gauge("policy_model_version", "Version of the live modulation policy", lambda: policy.version)
 base_dir = os.path.dirname(__file__)
 templates = Jinja2Templates(directory=os.path.join(base_dir, "templates"))
 app.mount("/static", StaticFiles(directory=os.path.join(base_dir, "static")), name="static")
 
-# Simple in-memory rooms: room_id -> {"tx": ws, "rx": ws, "snr": float}
-rooms: Dict[str, Dict[str, Any]] = {}
-
-ml_model = load_model()
-
-def get_room(room_id: str):
-    if room_id not in rooms:
-        rooms[room_id] = {"tx": None, "rx": None, "snr": 8.0}
-    return rooms[room_id]
-
-# ---- helper: pretty-print first N bits as 0/1 with spacing ----
-def bits_str(buf: bytes, max_bits: int = 256, group: int = 8, line: int = 64) -> str:
-    bits = bytes_to_bits(buf)[:max_bits]
-    s = ''.join('1' if b else '0' for b in bits)
-    out = []
-    for i, ch in enumerate(s, 1):
-        out.append(ch)
-        if i % group == 0: out.append(' ')
-        if i % line == 0: out.append('\n')
-    return ''.join(out).strip()
-
-def bits_list(buf: bytes, max_bits: int = 256):
-    return bytes_to_bits(buf)[:max_bits].astype(int).tolist()
+policy = PolicySlot(load_model())
+# per-frame outcomes are only logged when something retrains from them
+link_log = LinkLog(LINK_LOG_DIR) if ONLINE_RETRAIN else None
+artifacts = ArtifactCache()
+
+def capture_artifacts(room_id, ct, fec_ct, noisy_bytes, I_clean, Q_clean, I_noisy, Q_noisy, snr):
+    # Keep preview inputs for this frame only if someone is watching the
+    # charts and the room's preview rate allows it; returns the frame id
+    # pages use with get_preview, or None.
+    if not backend.preview_due(room_id, PREVIEW_MIN_INTERVAL):
+        return None
+    frame_id = next_frame_id()
+    artifacts.put(frame_id, FrameArtifacts(ct, fec_ct, noisy_bytes, I_clean, Q_clean, I_noisy, Q_noisy, snr))
+    return frame_id
+
+def render_preview(frame_id: str):
+    # frame_artifacts message for a frame held here, or None
+    art = artifacts.get(frame_id)
+    if art is None:
+        return None
+    return encode({"type": "frame_artifacts", "frame_id": frame_id, "ok": True, **art.render()})
+
+# other workers' get_preview for our frames arrive through the backend
+backend.preview_source = render_preview
+
+def tx_pipeline(plain: bytes, password: str, snr: float, st: metrics.Stages):
+    # encrypt → FEC encode → modulate → channel → demodulate, each stage timed.
+    # Runs on a worker thread (run_tx); returns the frame and the preview inputs.
+    with st("select"):
+        # ML modulation choice (features kept simple for the demo)
+        version, model = policy.current()
+        scheme = select_modulation(model, snr, delay_ms=DELAY_MS, jitter_ms=JITTER_MS, recent_ber=RECENT_BER)
+    st.scheme = scheme
+
+    salt = new_salt()
+    with st("kdf"):
+        key = derive_key(password, salt)
+    seg = 0
+    if len(plain) >= segments.PARALLEL_MIN_BYTES:
+        # encrypt + FEC encode fused per segment, across cores
+        with st("seal_segments"):
+            iv, ct, fec_ct = segments.seal(plain, key)
+        seg = segments.SEGMENT_SIZE
+    else:
+        with st("encrypt"):
+            iv, ct = encrypt_with_key(plain, key)
+        # FEC encode + channel noise
+        with st("fec_encode"):
+            fec_ct = rep3_encode(ct)
+    ber = ber_for_scheme(snr, scheme)
+    with st("map"):
+        fec_bits = bytes_to_bits(fec_ct)
+        I_clean, Q_clean = bits_to_constellation(fec_bits, scheme)
+    with st("channel"):
+        I_noisy, Q_noisy = waveform_channel(I_clean, Q_clean, snr)
+    with st("demod"):
+        noisy_bits = demodulate_bits(I_noisy, Q_noisy, scheme)
+        noisy_bytes = np.packbits(noisy_bits).tobytes()
+
+    if link_log:
+        with st("link_log"):
+            # measured channel BER of this frame = the policy's outcome
+            nbits = len(fec_bits)
+            measured = np.count_nonzero(noisy_bits[:nbits] != fec_bits) / max(nbits, 1)
+            link_log.record(snr, DELAY_MS, JITTER_MS, RECENT_BER, scheme, measured, nbits, version)
+
+    frame = {
+        "frame_id": None,   # set by run_tx if the frame gets previews
+        "scheme": scheme,
+        "snr": snr,
+        "ber": ber,
+        "fec": "rep3",
+        "iv": base64.b64encode(iv).decode(),
+        "salt": base64.b64encode(salt).decode(),
+        "cipher": base64.b64encode(noisy_bytes).decode(),   # after Channel (RX receives)
+    }
+    if seg:
+        frame["seg"] = seg   # segmented AEAD: RX passes it back in rx_decrypt
+    return frame, (ct, fec_ct, noisy_bytes, I_clean, Q_clean, I_noisy, Q_noisy, snr)
+
+async def run_tx(room_id, plain: bytes, password: str, snr: float, st: metrics.Stages) -> dict:
+    # The sample-level channel alone takes seconds for MB payloads: run the
+    # pipeline off the event loop so other rooms keep flowing meanwhile.
+    frame, preview = await asyncio.to_thread(tx_pipeline, plain, password, snr, st)
+    # Previews (constellations, I/Q, bits, cipher heads) are fetched by frame id;
+    # capturing touches the room backend and the cache, so it stays on the loop
+    with st("preview"):
+        frame["frame_id"] = capture_artifacts(room_id, *preview)
+    return frame
+
+def rx_open(data: dict, password: str, fec_mode, seg, st: metrics.Stages):
+    # RX side of tx_pipeline, on a worker thread: -> (plaintext or None, failed segments)
+    with st("decode_b64"):
+        iv = base64.b64decode(data["iv"])
+        salt = base64.b64decode(data["salt"])
+        cipher = base64.b64decode(data["cipher"])
+
+    pt = None
+    bad_segments = 0
+    # one PBKDF2 run serves both decrypt attempts
+    with st("kdf"):
+        key = derive_key(password, salt)
+
+    # Segmented frame → FEC decode + decrypt per segment, across cores
+    if seg and fec_mode == "rep3":
+        with st("open_segments"):
+            pt, bad_segments = segments.open_encoded(cipher, key, iv, seg)
+
+    # If client says FEC=rep3 → decode then decrypt
+    elif fec_mode == "rep3":
+        with st("fec_decode"):
+            try_first = rep3_decode(cipher)
+        with st("decrypt"):
+            pt = decrypt_with_key(try_first, key, iv)
+
+    # Robust fallback: if still None, try decrypting raw (handles old clients without fec flag)
+    if pt is None and not seg:
+        with st("decrypt"):
+            pt = decrypt_with_key(cipher, key, iv)
+    return pt, bad_segments
+
+async def forward_frame(room_id, frame: dict, st: metrics.Stages):
+    # Serialize once; RX gets frame_rx, TX pages get the same body as frame_preview
+    with st("send"):
+        body = encode_body(frame)
+        await backend.publish(room_id, "rx", with_type(body, "frame_rx"))
+        await backend.publish(room_id, "tx", with_type(body, "frame_preview"))
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -58,232 +227,178 @@ async def tx_page(request: Request):
 async def rx_page(request: Request):
     return templates.TemplateResponse("rx.html", {"request": request})
 
+@app.get("/metrics")
+async def metrics_page():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ---- optional sampling profiler of the event-loop thread ----
+# Unauthenticated, so the endpoints only exist with ENABLE_PROFILER=1.
+# POST /debug/profiler?on=true&interval_ms=5  (on=false stops, reset=true clears)
+# GET  /debug/profiler  -> collapsed stacks for flamegraph.pl / speedscope
+ENABLE_PROFILER = os.environ.get("ENABLE_PROFILER", "0") == "1"
+
+if ENABLE_PROFILER:
+    @app.post("/debug/profiler")
+    async def profiler_toggle(on: bool = True, interval_ms: float = 5.0, reset: bool = False):
+        if reset:
+            profiler.reset()
+        if on:
+            # this handler runs on the loop thread, which is what we want sampled
+            profiler.start(interval_ms / 1000.0, threading.get_ident())
+        else:
+            profiler.stop()
+        return {"running": profiler.running, "samples": profiler.samples, "interval_ms": profiler.interval * 1000}
+
+    @app.get("/debug/profiler")
+    async def profiler_dump(top: int = None):
+        return PlainTextResponse(profiler.collapsed(top))
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
     room_id = None
     role = None
+    # every outbound message for this socket goes through its queue
+    sub = Subscriber(ws, None)
+    limits = ConnectionLimits()
     try:
         while True:
             msg = await ws.receive_text()
+            reason = limits.check(len(msg))
+            if reason == "size":
+                metrics.inc("ws_messages_rejected_total", reason=reason)
+                await ws.close(code=1009, reason="message too big")
+                break
+            if reason:
+                metrics.inc("ws_messages_rejected_total", reason=reason)
+                sub.send_json({"type": "error", "error": "rate limit exceeded, message dropped"})
+                continue
             data = json.loads(msg)
 
             # --- Join a room as TX or RX ---
             if data.get("type") == "join":
-                room_id = data["room"]
+                if room_id is not None:
+                    await backend.leave(room_id, role, sub)
+                room_id = role = None
+                room = data.get("room")
+                valid_room = isinstance(room, str) and 0 < len(room) <= MAX_ROOM_ID_LEN
+                if data.get("role") not in ("tx", "rx") or not valid_room:
+                    sub.send_json({"type": "error", "error": "bad join request"})
+                    continue
+                try:
+                    snr = await backend.join(room, data["role"], sub)
+                except RoomsFull as e:
+                    sub.send_json({"type": "error", "error": str(e)})
+                    continue
+                room_id = room
                 role = data["role"]  # "tx" or "rx"
-                room = get_room(room_id)
-                room[role] = ws
-                await ws.send_json({"type": "joined", "room": room_id, "role": role, "snr": room["snr"]})
-                peer = room["rx"] if role == "tx" else room["tx"]
-                if peer:
-                    await peer.send_json({"type": "peer_status", "status": "online"})
+                sub.role = role
+                sub.send_json({"type": "joined", "room": room_id, "role": role, "snr": snr})
+                peer_role = "rx" if role == "tx" else "tx"
+                await backend.publish(room_id, peer_role, encode({"type": "peer_status", "status": "online"}))
                 continue
 
             # --- TX updates SNR (channel condition slider) ---
             if data.get("type") == "set_snr":
-                room = get_room(room_id)
-                room["snr"] = float(data["snr"])
-                for peer in (room["tx"], room["rx"]):
-                    if peer:
-                        await peer.send_json({"type": "snr_update", "snr": room["snr"]})
+                await backend.set_snr(room_id, float(data["snr"]))
                 continue
 
-            # --- TX: send TEXT (encrypt → FEC encode → channel → previews → forward) ---
+            # --- TX: send TEXT (encrypt → FEC encode → channel → forward; previews on demand) ---
             if data.get("type") == "send_text":
-                room = get_room(room_id)
-                snr = room["snr"]
-                password = data["password"]
-                text = data["text"]
-
-                # ML modulation choice (features kept simple for the demo)
-                scheme = select_modulation(ml_model, snr, delay_ms=20, jitter_ms=3, recent_ber=1e-3)
-
-                # Encrypt
-                iv, salt, ct = encrypt_bytes(text.encode("utf-8"), password)
-
-                # FEC encode + channel noise
-                fec_mode = "rep3"
-                fec_ct = rep3_encode(ct)
-                ber = ber_for_scheme(snr, scheme)
-                fec_bits = bytes_to_bits(fec_ct)
-                I_clean, Q_clean = bits_to_constellation(fec_bits, scheme)
-                I_noisy, Q_noisy = add_awgn(I_clean, Q_clean, snr)
-                noisy_bits = demodulate_bits(I_noisy, Q_noisy, scheme)
-                noisy_bytes = np.packbits(noisy_bits).tobytes()
-
-                # Constellations (limit points)
-                const_clean = iq_points(I_clean, Q_clean, max_pts=200)
-                const_noisy = iq_points(I_noisy, Q_noisy, max_pts=200)
-                wave_clean = iq_series(I_clean, Q_clean, max_samples=256)
-                wave_noisy = iq_series(I_noisy, Q_noisy, max_samples=256)
-
-                # Bitstream previews (first 256 bits)
-                bits_raw   = bits_str(ct)
-                bits_clean = bits_str(fec_ct)
-                bits_noisy = bits_str(noisy_bytes)
-                bits_plot_raw   = bits_list(ct)
-                bits_plot_clean = bits_list(fec_ct)
-                bits_plot_noisy = bits_list(noisy_bytes)
-
-                frame_payload = {
-                    "type": "frame_rx",
-                    "kind": "text",
-                    "scheme": scheme,
-                    "snr": snr,
-                    "ber": ber,
-                    "fec": fec_mode,
-                    "iv": base64.b64encode(iv).decode(),
-                    "salt": base64.b64encode(salt).decode(),
-                    # encrypted previews
-                    "cipher_raw":   base64.b64encode(ct).decode(),      # before FEC/Channel
-                    "cipher_clean": base64.b64encode(fec_ct).decode(),  # after FEC, before Channel
-                    "cipher":       base64.b64encode(noisy_bytes).decode(),   # after Channel (RX receives)
-                    # constellations
-                    "const_clean": const_clean,
-                    "const_noisy": const_noisy,
-                    # bits (0/1)
-                    "bits_raw": bits_raw,
-                    "bits_clean": bits_clean,
-                    "bits_noisy": bits_noisy,
-                    # structured previews
-                    "wave_clean": wave_clean,
-                    "wave_noisy": wave_noisy,
-                    "bits_plot_raw": bits_plot_raw,
-                    "bits_plot_clean": bits_plot_clean,
-                    "bits_plot_noisy": bits_plot_noisy,
-                }
-
-                # Send to RX
-                rx = room["rx"]
-                if rx:
-                    await rx.send_json(frame_payload)
-
-                # Also preview back to TX (so TX page can display graphs too)
-                tx = room["tx"]
-                if tx:
-                    preview = dict(frame_payload)
-                    preview["type"] = "frame_preview"
-                    await tx.send_json(preview)
-
-                await ws.send_json({"type": "tx_ack", "info": f"TEXT via {scheme} @ {snr:.1f}dB (BER~{ber:.2e})"})
+                snr = backend.get_snr(room_id)
+                plain = data["text"].encode("utf-8")
+                if len(plain) > MAX_PAYLOAD_BYTES:
+                    sub.send_json({"type": "error", "error": f"text too large (max {MAX_PAYLOAD_BYTES} bytes)"})
+                    continue
+                st = metrics.Stages("send_text", len(plain))
+
+                frame = {"kind": "text", **await run_tx(room_id, plain, data["password"], snr, st)}
+                await forward_frame(room_id, frame, st)
+
+                scheme, ber = frame["scheme"], frame["ber"]
+                sub.send_json({"type": "tx_ack", "info": f"TEXT via {scheme} @ {snr:.1f}dB (BER~{ber:.2e})"})
+                st.commit()
                 continue
 
-            # --- TX: send FILE (encrypt → FEC encode → channel → previews → forward) ---
+            # --- TX: send FILE (encrypt → FEC encode → channel → forward; previews on demand) ---
             if data.get("type") == "send_file":
-                room = get_room(room_id)
-                snr = room["snr"]
-                password = data["password"]
+                snr = backend.get_snr(room_id)
                 name = data["name"]
-                content_b64 = data["content_b64"]
-                buf = base64.b64decode(content_b64)
-
-                scheme = select_modulation(ml_model, snr, delay_ms=20, jitter_ms=3, recent_ber=1e-3)
-
-                iv, salt, ct = encrypt_bytes(buf, password)
-
-                fec_mode = "rep3"
-                fec_ct = rep3_encode(ct)
-                ber = ber_for_scheme(snr, scheme)
-                fec_bits = bytes_to_bits(fec_ct)
-                I_clean, Q_clean = bits_to_constellation(fec_bits, scheme)
-                I_noisy, Q_noisy = add_awgn(I_clean, Q_clean, snr)
-                noisy_bits = demodulate_bits(I_noisy, Q_noisy, scheme)
-                noisy_bytes = np.packbits(noisy_bits).tobytes()
-
-                const_clean = iq_points(I_clean, Q_clean, max_pts=200)
-                const_noisy = iq_points(I_noisy, Q_noisy, max_pts=200)
-                wave_clean = iq_series(I_clean, Q_clean, max_samples=256)
-                wave_noisy = iq_series(I_noisy, Q_noisy, max_samples=256)
-
-                bits_raw   = bits_str(ct)
-                bits_clean = bits_str(fec_ct)
-                bits_noisy = bits_str(noisy_bytes)
-                bits_plot_raw   = bits_list(ct)
-                bits_plot_clean = bits_list(fec_ct)
-                bits_plot_noisy = bits_list(noisy_bytes)
-
-                frame_payload = {
-                    "type": "frame_rx",
-                    "kind": "file",
-                    "name": name,
-                    "scheme": scheme,
-                    "snr": snr,
-                    "ber": ber,
-                    "fec": fec_mode,
-                    "iv": base64.b64encode(iv).decode(),
-                    "salt": base64.b64encode(salt).decode(),
-                    "cipher_raw":   base64.b64encode(ct).decode(),
-                    "cipher_clean": base64.b64encode(fec_ct).decode(),
-                    "cipher":       base64.b64encode(noisy_bytes).decode(),
-                    "const_clean": const_clean,
-                    "const_noisy": const_noisy,
-                    "bits_raw": bits_raw,
-                    "bits_clean": bits_clean,
-                    "bits_noisy": bits_noisy,
-                    "wave_clean": wave_clean,
-                    "wave_noisy": wave_noisy,
-                    "bits_plot_raw": bits_plot_raw,
-                    "bits_plot_clean": bits_plot_clean,
-                    "bits_plot_noisy": bits_plot_noisy,
-                }
-
-                # Send to RX
-                rx = room["rx"]
-                if rx:
-                    await rx.send_json(frame_payload)
-
-                # TX preview
-                tx = room["tx"]
-                if tx:
-                    preview = dict(frame_payload)
-                    preview["type"] = "frame_preview"
-                    await tx.send_json(preview)
-
-                await ws.send_json({"type": "tx_ack", "info": f'FILE "{name}" via {scheme} @ {snr:.1f}dB (BER~{ber:.2e})'})
+                # RX could not send a bigger frame back for decryption
+                if len(data["content_b64"]) * 3 // 4 > MAX_PAYLOAD_BYTES:
+                    sub.send_json({"type": "error", "error": f"file too large (max {MAX_PAYLOAD_BYTES} bytes)"})
+                    continue
+                st = metrics.Stages("send_file", len(data["content_b64"]) * 3 // 4)
+                with st("decode_b64"):
+                    buf = base64.b64decode(data["content_b64"])
+
+                frame = {"kind": "file", "name": name, **await run_tx(room_id, buf, data["password"], snr, st)}
+                await forward_frame(room_id, frame, st)
+
+                scheme, ber = frame["scheme"], frame["ber"]
+                sub.send_json({"type": "tx_ack", "info": f'FILE "{name}" via {scheme} @ {snr:.1f}dB (BER~{ber:.2e})'})
+                st.commit()
+                continue
+
+            # --- Pages toggle chart previews (e.g. off while the tab is hidden) ---
+            if data.get("type") == "previews":
+                await backend.set_previews(room_id, sub, bool(data.get("on", True)))
+                continue
+
+            # --- Page fetches the charts for a frame it was told about ---
+            if data.get("type") == "get_preview":
+                frame_id = data.get("frame_id")
+                if not (isinstance(frame_id, str) and len(frame_id) <= MAX_FRAME_ID_LEN):
+                    sub.send_json({"type": "frame_artifacts", "frame_id": None, "ok": False})
+                    continue
+                # not here: produced by another worker (asked through the hub), or evicted
+                text = render_preview(frame_id) or await backend.fetch_preview(frame_id)
+                if text is None:
+                    sub.send_json({"type": "frame_artifacts", "frame_id": frame_id, "ok": False})
+                else:
+                    sub.send(text)
                 continue
 
             # --- RX: decrypt request (server-side to keep Python-only core) ---
             if data.get("type") == "rx_decrypt":
                 password = data["password"]
-                iv = base64.b64decode(data["iv"])
-                salt = base64.b64decode(data["salt"])
-                cipher = base64.b64decode(data["cipher"])
+                # scheme is client-supplied: whitelist it to keep label sets bounded
+                scheme = data.get("scheme") if data.get("scheme") in ("BPSK", "QPSK", "16QAM") else "-"
+                st = metrics.Stages("rx_decrypt", len(data["cipher"]) * 3 // 4, scheme)
                 fec_mode = data.get("fec")  # might be None if old client
+                seg = data.get("seg")       # set for segmented frames (app/segments.py)
+                if seg is not None and not (isinstance(seg, int) and 4096 <= seg <= 16 << 20):
+                    sub.send_json({"type": "error", "error": "bad segment size"})
+                    continue
 
-                pt = None
-
-                # If client says FEC=rep3 → decode then decrypt
-                if fec_mode == "rep3":
-                    try_first = rep3_decode(cipher)
-                    pt = decrypt_bytes(try_first, password, iv, salt)
-
-                # Robust fallback: if still None, try decrypting raw (handles old clients without fec flag)
-                if pt is None:
-                    pt = decrypt_bytes(cipher, password, iv, salt)
+                # decode + KDF + FEC decode + decrypt take seconds for MB frames
+                pt, bad_segments = await asyncio.to_thread(rx_open, data, password, fec_mode, seg, st)
 
                 if pt is None:
-                    await ws.send_json({"type": "rx_result", "ok": False})
+                    msg = {"type": "rx_result", "ok": False}
+                    if bad_segments:
+                        msg["bad_segments"] = bad_segments
+                    sub.send_json(msg)
                 else:
                     if data.get("kind") == "text":
                         try:
                             text = pt.decode()
                         except Exception:
                             text = "<binary>"
-                        await ws.send_json({"type": "rx_result", "ok": True, "kind": "text", "text": text})
+                        sub.send_json({"type": "rx_result", "ok": True, "kind": "text", "text": text})
                     else:
-                        await ws.send_json({
+                        sub.send_json({
                             "type": "rx_result",
                             "ok": True,
                             "kind": "file",
                             "file_b64": base64.b64encode(pt).decode()
                         })
+                st.commit()
                 continue
 
     except WebSocketDisconnect:
         pass
     finally:
-        if room_id and role:
-            room = get_room(room_id)
-            if room.get(role) is ws:
-                room[role] = None
+        if room_id is not None:
+            await backend.leave(room_id, role, sub)
+        sub.detach()
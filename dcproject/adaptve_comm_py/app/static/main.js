@@ -1,12 +1,134 @@
 let ws = null;
 
 function $(id){ return document.getElementById(id); }
-function log(msg){ const el = $("log"); if (el) el.textContent = msg + "\n" + el.textContent; }
+// --------- Batched UI updates ----------
+// Messages can arrive far faster than the screen refreshes. DOM and canvas
+// work is queued per key (newest wins) and done once per animation frame;
+// protocol replies (rx_decrypt, get_preview) are still sent per message.
+const uiTasks = new Map();
+let uiScheduled = false;
+
+function onNextFrame(key, fn){
+  uiTasks.set(key, fn);
+  if (uiScheduled) return;
+  uiScheduled = true;
+  requestAnimationFrame(() => {
+    uiScheduled = false;
+    const tasks = [...uiTasks.values()];
+    uiTasks.clear();
+    for (const fn of tasks) fn();
+  });
+}
+
+const LOG_MAX_LINES = 500;
+let logLines = [];
+
+function log(msg){
+  logLines.push(msg);
+  if (logLines.length > LOG_MAX_LINES) logLines = logLines.slice(-LOG_MAX_LINES);
+  onNextFrame("log", flushLog);
+}
+
+function flushLog(){
+  const el = $("log");
+  if (!el || !logLines.length) return;
+  // newest first, capped so the pane never grows without bound
+  const text = logLines.reverse().join("\n") + "\n" + el.textContent;
+  logLines = [];
+  let cut = -1;
+  for (let i = 0, n = 0; i < text.length && cut < 0; i++) {
+    if (text.charCodeAt(i) === 10 && ++n === LOG_MAX_LINES) cut = i;
+  }
+  el.textContent = cut >= 0 ? text.slice(0, cut) : text;
+}
 
-function truncateBase64(b64, maxChars=260){
+function truncateBase64(b64, maxChars=260, fullLen){
   if (!b64) return "";
-  return b64.length > maxChars ? (b64.slice(0, maxChars) + " … ("+b64.length+" chars)") : b64;
+  const n = fullLen ?? b64.length;   // server sends only the head + full length
+  return n > maxChars ? (b64.slice(0, maxChars) + " … ("+n+" chars)") : b64;
+}
+
+// --------- Preview artifacts (fetched on demand, one request in flight) ----------
+// The reply can be lost (rate limit, drop-oldest send queue, reconnect), so
+// the in-flight slot is also released on a server error, after
+// PREVIEW_TIMEOUT_MS, and whenever the socket opens or closes.
+const PREVIEW_TIMEOUT_MS = 3000;
+let previewInFlight = null;   // frame id awaiting frame_artifacts
+let previewTimer = null;
+let previewNext = null;
+const frameSchemes = new Map();
+
+function requestPreview(frameId, scheme){
+  if (!frameId || !ws || ws.readyState !== WebSocket.OPEN) return;
+  frameSchemes.set(frameId, scheme);
+  if (previewInFlight) { previewNext = frameId; return; }   // only the newest waits
+  previewInFlight = frameId;
+  previewTimer = setTimeout(previewLost, PREVIEW_TIMEOUT_MS);
+  ws.send(JSON.stringify({ type: "get_preview", frame_id: frameId }));
+}
+
+function previewSettled(){
+  // free the slot and ask for the newest frame that came in meanwhile
+  clearTimeout(previewTimer);
+  previewTimer = null;
+  previewInFlight = null;
+  const next = previewNext;
+  const nextScheme = frameSchemes.get(next);
+  previewNext = null;
+  frameSchemes.clear();
+  if (next) requestPreview(next, nextScheme);
+}
+
+function previewLost(){
+  if (previewInFlight) previewSettled();
+}
+
+function resetPreviews(){
+  clearTimeout(previewTimer);
+  previewTimer = null;
+  previewInFlight = null;
+  previewNext = null;
+  frameSchemes.clear();
+}
+
+function onPreview(a){
+  if (a.ok) {
+    const scheme = frameSchemes.get(a.frame_id);
+    onNextFrame("artifacts", () => renderArtifacts(a, scheme));
+  }
+  // a late reply to a request already given up on must not free the current one
+  if (a.frame_id === previewInFlight) previewSettled();
+}
+
+function renderArtifacts(a, scheme){
+  // RX page
+  if ($("enc_raw"))   $("enc_raw").textContent   = truncateBase64(a.cipher_raw, 260, a.cipher_raw_len);
+  if ($("enc_clean")) $("enc_clean").textContent = truncateBase64(a.cipher_clean, 260, a.cipher_clean_len);
+  if ($("enc_bits_raw"))   $("enc_bits_raw").textContent   = a.bits_raw   || "";
+  if ($("enc_bits_clean")) $("enc_bits_clean").textContent = a.bits_clean || "";
+  if ($("enc_bits_noisy")) $("enc_bits_noisy").textContent = a.bits_noisy || "";
+  drawConstellation("rx_const_clean", a.const_clean, scheme);
+  drawConstellation("rx_const_noisy", a.const_noisy, scheme);
+
+  // TX page
+  if ($("tx_raw"))   $("tx_raw").textContent   = truncateBase64(a.cipher_raw, 260, a.cipher_raw_len);
+  if ($("tx_clean")) $("tx_clean").textContent = truncateBase64(a.cipher_clean, 260, a.cipher_clean_len);
+  if ($("tx_bits_raw"))   $("tx_bits_raw").textContent   = a.bits_raw   || "";
+  if ($("tx_bits_clean")) $("tx_bits_clean").textContent = a.bits_clean || "";
+  if ($("tx_bits_noisy")) $("tx_bits_noisy").textContent = a.bits_noisy || "";
+  drawConstellation("tx_const_clean", a.const_clean, scheme);
+  drawConstellation("tx_const_noisy", a.const_noisy, scheme);
+  drawWaveform("tx_wave_clean", a.wave_clean);
+  drawWaveform("tx_wave_noisy", a.wave_noisy);
+  drawBitChart("tx_bits_plot", a.bits_plot_raw, a.bits_plot_clean, a.bits_plot_noisy);
+}
+
+// charts only matter while the page is visible
+function sendPreviewState(){
+  if (ws && ws.readyState === WebSocket.OPEN)
+    ws.send(JSON.stringify({ type: "previews", on: !document.hidden }));
 }
+document.addEventListener("visibilitychange", sendPreviewState);
 
 function setStatus(text, online){
   const el = $("status");
@@ -17,14 +139,88 @@ function setStatus(text, online){
   el.classList.toggle("offline", !online);
 }
 
+// --------- Packed IQ previews ----------
+// The server sends constellations and waveforms as {n, scale, iq}: base64 of
+// interleaved little-endian int16 I,Q (see channel.iq_packed). Decoded once
+// into typed arrays; nothing is boxed per point.
+function unpackIQ(p){
+  const bin = atob(p.iq || "");
+  const bytes = new Uint8Array(bin.length);
+  for (let k = 0; k < bin.length; k++) bytes[k] = bin.charCodeAt(k);
+  const raw = new Int16Array(bytes.buffer, 0, bytes.length >> 1);
+  const n = Math.min(p.n, raw.length >> 1);
+  const I = new Float32Array(n), Q = new Float32Array(n);
+  for (let k = 0; k < n; k++) {
+    I[k] = raw[2*k] * p.scale;
+    Q[k] = raw[2*k + 1] * p.scale;
+  }
+  return { n, I, Q };
+}
+
 // --------- Constellation drawing ----------
-function drawConstellation(canvasId, points, scheme){
+// Up to DENSITY_MIN_POINTS points are drawn as dots in one path/fill; above
+// that, points are binned per pixel and drawn as a log-scaled density map
+// (one putImageData), so cost is O(points + pixels) whatever the count.
+const DENSITY_MIN_POINTS = 2048;
+const densityBuffers = new WeakMap();   // canvas -> {counts, img}
+let densityLut = null;                  // count level -> packed RGBA
+
+function densityColors(){
+  if (densityLut) return densityLut;
+  // transparent -> #1e3a8a -> #93c5fd -> white
+  const stops = [[30, 58, 138], [147, 197, 253], [255, 255, 255]];
+  densityLut = new Uint32Array(256);
+  for (let k = 1; k < 256; k++) {
+    const t = k / 255, u = t < 0.6 ? t / 0.6 : (t - 0.6) / 0.4;
+    const [a, b] = t < 0.6 ? [stops[0], stops[1]] : [stops[1], stops[2]];
+    const r = a[0] + (b[0] - a[0])*u, g = a[1] + (b[1] - a[1])*u, bl = a[2] + (b[2] - a[2])*u;
+    const alpha = Math.min(255, 90 + 3*k);
+    densityLut[k] = ((alpha << 24) | (bl << 16) | (g << 8) | r) >>> 0;   // little-endian RGBA
+  }
+  return densityLut;
+}
+
+function drawDensity(ctx, cv, I, Q, n, minV, sx, sy){
+  const W = cv.width, H = cv.height;
+  let buf = densityBuffers.get(cv);
+  if (!buf || buf.img.width !== W || buf.img.height !== H) {
+    buf = { counts: new Uint32Array(W*H), img: ctx.createImageData(W, H) };
+    densityBuffers.set(cv, buf);
+  }
+  const counts = buf.counts;
+  counts.fill(0);
+  let peak = 0;
+  for (let k = 0; k < n; k++) {
+    const x = ((I[k] - minV)*sx) | 0;
+    const y = (H - (Q[k] - minV)*sy) | 0;
+    if (x < 0 || x >= W || y < 0 || y >= H) continue;
+    const c = ++counts[y*W + x];
+    if (c > peak) peak = c;
+  }
+  const lut = densityColors();
+  const px = new Uint32Array(buf.img.data.buffer);
+  const norm = 255 / Math.log1p(peak || 1);
+  for (let k = 0; k < counts.length; k++) {
+    const c = counts[k];
+    px[k] = c ? lut[Math.max(1, Math.round(Math.log1p(c)*norm))] : 0;
+  }
+  ctx.putImageData(buf.img, 0, 0);
+}
+
+function drawConstellation(canvasId, packed, scheme){
   const cv = $(canvasId);
-  if (!cv || !points) return;
+  if (!cv || !packed) return;
   const ctx = cv.getContext("2d");
   const W = cv.width, H = cv.height;
+  const { n, I, Q } = unpackIQ(packed);
   ctx.clearRect(0,0,W,H);
 
+  // scale – assume symbols roughly in [-1.5, +1.5]
+  const minV = -1.6, maxV = +1.6;
+  const sx = W/(maxV-minV), sy = H/(maxV-minV);
+
+  if (n >= DENSITY_MIN_POINTS) drawDensity(ctx, cv, I, Q, n, minV, sx, sy);
+
   // axes
   ctx.strokeStyle = "#334155";
   ctx.lineWidth = 1;
@@ -33,39 +229,36 @@ function drawConstellation(canvasId, points, scheme){
   ctx.moveTo(W/2, 0); ctx.lineTo(W/2, H);
   ctx.stroke();
 
-  // scale – assume symbols roughly in [-1.5, +1.5]
-  const minV = -1.6, maxV = +1.6;
-  const sx = W/(maxV-minV), sy = H/(maxV-minV);
-
   // points
-  ctx.fillStyle = "#93c5fd";
-  const r = 2;
-  for (const p of points){
-    const i = Array.isArray(p) ? p[0] : p.i;
-    const q = Array.isArray(p) ? p[1] : p.q;
-    const x = (i - minV)*sx;
-    const y = H - (q - minV)*sy;
+  if (n < DENSITY_MIN_POINTS) {
+    ctx.fillStyle = "#93c5fd";
+    const r = 2;
     ctx.beginPath();
-    ctx.arc(x, y, r, 0, Math.PI*2);
+    for (let k = 0; k < n; k++) {
+      const x = (I[k] - minV)*sx;
+      const y = H - (Q[k] - minV)*sy;
+      ctx.moveTo(x + r, y);
+      ctx.arc(x, y, r, 0, Math.PI*2);
+    }
     ctx.fill();
   }
 
   // tiny label
   ctx.fillStyle = "#94a3b8";
   ctx.font = "12px sans-serif";
-  ctx.fillText(scheme || "", 6, 14);
+  ctx.fillText(scheme ? `${scheme} · ${n} pts` : "", 6, 14);
 }
 
-function drawWaveform(canvasId, series){
+function drawWaveform(canvasId, packed){
   const cv = $(canvasId);
-  if (!cv || !series) return;
+  if (!cv || !packed) return;
   const ctx = cv.getContext("2d");
   const W = cv.width, H = cv.height;
   ctx.clearRect(0,0,W,H);
-  const I = series.I || [];
-  const Q = series.Q || [];
-  if (!I.length && !Q.length) return;
-  const maxAbs = Math.max(1e-3, ...I.map(v=>Math.abs(v)), ...Q.map(v=>Math.abs(v)));
+  const { n, I, Q } = unpackIQ(packed);
+  if (!n) return;
+  let maxAbs = 1e-3;
+  for (let k = 0; k < n; k++) maxAbs = Math.max(maxAbs, Math.abs(I[k]), Math.abs(Q[k]));
   const scaleY = (H/2-6)/maxAbs;
 
   ctx.strokeStyle = "#334155";
@@ -75,15 +268,26 @@ function drawWaveform(canvasId, series){
   ctx.stroke();
 
   const drawSeries = (arr, color) => {
-    if (!arr.length) return;
     ctx.strokeStyle = color;
     ctx.beginPath();
-    arr.forEach((val, idx) => {
-      const x = (idx/(arr.length-1 || 1)) * W;
-      const y = H/2 - val*scaleY;
-      if (idx === 0) ctx.moveTo(x, y);
-      else ctx.lineTo(x, y);
-    });
+    if (n <= 2*W) {
+      for (let k = 0; k < n; k++) {
+        const x = (k/(n-1 || 1)) * W;
+        const y = H/2 - arr[k]*scaleY;
+        if (k === 0) ctx.moveTo(x, y);
+        else ctx.lineTo(x, y);
+      }
+    } else {
+      // more samples than pixels: min/max envelope per pixel column
+      for (let x = 0; x < W; x++) {
+        const a = Math.floor(x*n/W), b = Math.floor((x + 1)*n/W);
+        let lo = arr[a], hi = arr[a];
+        for (let k = a + 1; k < b; k++) { const v = arr[k]; if (v < lo) lo = v; else if (v > hi) hi = v; }
+        if (x === 0) ctx.moveTo(x + 0.5, H/2 - hi*scaleY);
+        else ctx.lineTo(x + 0.5, H/2 - hi*scaleY);
+        ctx.lineTo(x + 0.5, H/2 - lo*scaleY);
+      }
+    }
     ctx.stroke();
   };
 
@@ -134,6 +338,7 @@ function drawBitChart(canvasId, raw, clean, noisy){
 
 function connect(room, role){
   const url = (location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws";
+  resetPreviews();
   ws = new WebSocket(url);
   ws.onopen = () => {
     ws.send(JSON.stringify({ type: "join", room, role }));
@@ -144,6 +349,7 @@ function connect(room, role){
 
     if (msg.type === "joined") {
       if ($("snr_val") && typeof msg.snr !== "undefined") $("snr_val").textContent = `${msg.snr} dB`;
+      sendPreviewState();
       log(`Joined room ${msg.room} as ${msg.role}`);
     }
     if (msg.type === "snr_update") {
@@ -153,29 +359,27 @@ function connect(room, role){
     if (msg.type === "tx_ack") {
       log(msg.info);
     }
+    if (msg.type === "error") {
+      log(`Server: ${msg.error}`);
+      // errors are not tied to a request: it may have been our get_preview
+      previewLost();
+    }
 
     // ------- RX receives a frame -------
     if (msg.type === "frame_rx") {
       const pwd = $("pwd") ? $("pwd").value : "";
 
-      // Fill encrypted previews (RX)
-      if ($("enc_scheme")) $("enc_scheme").textContent = msg.scheme || "-";
-      if ($("enc_snr")) $("enc_snr").textContent = `SNR: ${msg.snr?.toFixed?.(1) ?? "–"} dB`;
-      if ($("enc_ber")) $("enc_ber").textContent = `BER: ${Number(msg.ber).toExponential(2)}`;
-      if ($("enc_fec")) $("enc_fec").textContent = `FEC: ${msg.fec || "none"}`;
-
-      if ($("enc_raw"))   $("enc_raw").textContent   = truncateBase64(msg.cipher_raw);
-      if ($("enc_clean")) $("enc_clean").textContent = truncateBase64(msg.cipher_clean);
-      if ($("enc_noisy")) $("enc_noisy").textContent = truncateBase64(msg.cipher);
+      // Fill encrypted previews (RX), once per animation frame for the newest frame
+      onNextFrame("frame_rx", () => {
+        if ($("enc_scheme")) $("enc_scheme").textContent = msg.scheme || "-";
+        if ($("enc_snr")) $("enc_snr").textContent = `SNR: ${msg.snr?.toFixed?.(1) ?? "–"} dB`;
+        if ($("enc_ber")) $("enc_ber").textContent = `BER: ${Number(msg.ber).toExponential(2)}`;
+        if ($("enc_fec")) $("enc_fec").textContent = `FEC: ${msg.fec || "none"}`;
+        if ($("enc_noisy")) $("enc_noisy").textContent = truncateBase64(msg.cipher);
+      });
 
-      // NEW: bitstreams on RX page
-      if ($("enc_bits_raw"))   $("enc_bits_raw").textContent   = msg.bits_raw   || "";
-      if ($("enc_bits_clean")) $("enc_bits_clean").textContent = msg.bits_clean || "";
-      if ($("enc_bits_noisy")) $("enc_bits_noisy").textContent = msg.bits_noisy || "";
-
-      // Draw RX constellations
-      drawConstellation("rx_const_clean", msg.const_clean, msg.scheme);
-      drawConstellation("rx_const_noisy", msg.const_noisy, msg.scheme);
+      // Bitstreams + constellations arrive separately (only for previewed frames)
+      requestPreview(msg.frame_id, msg.scheme);
 
       log(`RX frame via ${msg.scheme} @SNR=${msg.snr}dB (BER~${Number(msg.ber).toExponential(2)})`);
 
@@ -184,38 +388,38 @@ function connect(room, role){
         type: "rx_decrypt",
         password: pwd,
         kind: msg.kind,
+        scheme: msg.scheme,   // label for server-side stage timings
         iv: msg.iv,
         salt: msg.salt,
         cipher: msg.cipher,
-        fec: msg.fec || null
+        fec: msg.fec || null,
+        seg: msg.seg || null   // segment size of segmented (large) frames
       }));
     }
 
     // ------- TX preview for the last sent frame -------
     if (msg.type === "frame_preview") {
-      if ($("tx_scheme")) $("tx_scheme").textContent = msg.scheme || "-";
-      if ($("tx_snr")) $("tx_snr").textContent = `SNR: ${msg.snr?.toFixed?.(1) ?? "–"} dB`;
-      if ($("tx_ber")) $("tx_ber").textContent = `BER: ${Number(msg.ber).toExponential(2)}`;
-      if ($("tx_fec")) $("tx_fec").textContent = `FEC: ${msg.fec || "none"}`;
-
-      if ($("tx_raw"))   $("tx_raw").textContent   = truncateBase64(msg.cipher_raw);
-      if ($("tx_clean")) $("tx_clean").textContent = truncateBase64(msg.cipher_clean);
-      if ($("tx_noisy")) $("tx_noisy").textContent = truncateBase64(msg.cipher);
-
-      // NEW: bitstreams on TX page
-      if ($("tx_bits_raw"))   $("tx_bits_raw").textContent   = msg.bits_raw   || "";
-      if ($("tx_bits_clean")) $("tx_bits_clean").textContent = msg.bits_clean || "";
-      if ($("tx_bits_noisy")) $("tx_bits_noisy").textContent = msg.bits_noisy || "";
-
-      drawConstellation("tx_const_clean", msg.const_clean, msg.scheme);
-      drawConstellation("tx_const_noisy", msg.const_noisy, msg.scheme);
-      drawWaveform("tx_wave_clean", msg.wave_clean);
-      drawWaveform("tx_wave_noisy", msg.wave_noisy);
-      drawBitChart("tx_bits_plot", msg.bits_plot_raw, msg.bits_plot_clean, msg.bits_plot_noisy);
+      onNextFrame("frame_preview", () => {
+        if ($("tx_scheme")) $("tx_scheme").textContent = msg.scheme || "-";
+        if ($("tx_snr")) $("tx_snr").textContent = `SNR: ${msg.snr?.toFixed?.(1) ?? "–"} dB`;
+        if ($("tx_ber")) $("tx_ber").textContent = `BER: ${Number(msg.ber).toExponential(2)}`;
+        if ($("tx_fec")) $("tx_fec").textContent = `FEC: ${msg.fec || "none"}`;
+        if ($("tx_noisy")) $("tx_noisy").textContent = truncateBase64(msg.cipher);
+      });
+
+      requestPreview(msg.frame_id, msg.scheme);
+    }
+
+    if (msg.type === "frame_artifacts") {
+      onPreview(msg);
     }
 
     if (msg.type === "rx_result") {
-      if (!msg.ok) { log("Decrypt: ❌ AUTH FAIL (too noisy?)"); return; }
+      if (!msg.ok) {
+        const segs = msg.bad_segments ? ` (${msg.bad_segments} segment(s) failed)` : "";
+        log("Decrypt: ❌ AUTH FAIL (too noisy?)" + segs);
+        return;
+      }
       if (msg.kind === "text") {
         log("Decrypt: ✅ TEXT → " + msg.text);
       } else if (msg.kind === "file") {
@@ -229,7 +433,10 @@ function connect(room, role){
       }
     }
   };
-  ws.onclose = () => setStatus("Disconnected", false);
+  ws.onclose = () => {
+    resetPreviews();
+    setStatus("Disconnected", false);
+  };
 }
 
 function asBase64(file){
@@ -0,0 +1 @@
+# empty init so 'bench' is a package
@@ -0,0 +1,91 @@
+# bench/bench_fanout.py
+# Frame delivery latency for one TX fanning out to 1/10/100 RX pages.
+# Starts the app in a separate uvicorn process (so client decoding does not
+# share the server's GIL) and drives it with real websockets.
+# per-message-deflate is turned off: it compresses every copy separately,
+# which costs more than the whole encode-once broadcast at 100 receivers.
+# Run from adaptve_comm_py/:  python -m bench.bench_fanout
+import asyncio, json, os, socket, subprocess, sys, time
+import numpy as np
+import websockets
+
+def _free_port() -> int:
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def start_server(port: int, workers: int = 1, env: dict = None):
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.server:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+                             "--ws-per-message-deflate", "false"],
+                            env=dict(os.environ, **(env or {})))
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+async def _join(url, room, role):
+    ws = await websockets.connect(url, max_size=None)
+    await ws.send(json.dumps({"type": "join", "room": room, "role": role}))
+    while json.loads(await ws.recv())["type"] != "joined":
+        pass
+    return ws
+
+async def _next_of(ws, msg_type):
+    while True:
+        msg = json.loads(await ws.recv())
+        if msg["type"] == msg_type:
+            return time.perf_counter()
+
+async def run_case(url, n_rx, n_msgs=30, stalled=0):
+    room = f"bench-{n_rx}-{stalled}-{time.time_ns()}"
+    rxs = [await _join(url, room, "rx") for _ in range(n_rx)]
+    # stalled receivers join but never read; they must not slow the others
+    dead = [await _join(url, room, "rx") for _ in range(stalled)]
+    tx = await _join(url, room, "tx")
+
+    first, last, ack = [], [], []
+    for i in range(n_msgs):
+        t0 = time.perf_counter()
+        await tx.send(json.dumps({"type": "send_text", "text": f"msg {i} " + "x"*200, "password": "bench"}))
+        got = await asyncio.gather(*[_next_of(ws, "frame_rx") for ws in rxs])
+        t_ack = await _next_of(tx, "tx_ack")
+        first.append(min(got) - t0)
+        last.append(max(got) - t0)
+        ack.append(t_ack - t0)
+
+    for ws in rxs + dead + [tx]:
+        await ws.close()
+    ms = lambda a, q: 1e3*float(np.percentile(a, q))
+    return {
+        "receivers": n_rx, "stalled": stalled,
+        "first_p50_ms": ms(first, 50), "last_p50_ms": ms(last, 50), "last_p99_ms": ms(last, 99),
+        "spread_p50_ms": ms(np.subtract(last, first), 50), "ack_p50_ms": ms(ack, 50),
+    }
+
+async def main_async(port):
+    url = f"ws://127.0.0.1:{port}/ws"
+    print(f"{'rx':>4} {'stalled':>7} {'first p50':>10} {'last p50':>9} {'last p99':>9} {'spread p50':>11} {'ack p50':>8}  (ms)")
+    for n_rx, stalled in ((1, 0), (10, 0), (100, 0), (10, 5)):
+        r = await run_case(url, n_rx, stalled=stalled)
+        print(f"{r['receivers']:>4} {r['stalled']:>7} {r['first_p50_ms']:>10.2f} {r['last_p50_ms']:>9.2f} "
+              f"{r['last_p99_ms']:>9.2f} {r['spread_p50_ms']:>11.2f} {r['ack_p50_ms']:>8.2f}")
+
+def main():
+    port = _free_port()
+    proc = start_server(port)
+    try:
+        asyncio.run(main_async(port))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+if __name__ == "__main__":
+    main()
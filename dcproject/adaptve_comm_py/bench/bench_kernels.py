@@ -0,0 +1,356 @@
+# bench/bench_kernels.py
+# Micro/macro benchmarks for the DSP, FEC, crypto and ML kernels.
+# Results are appended to a JSON-lines history so runs can be compared.
+#
+# Run from adaptve_comm_py/:
+#   python -m bench.bench_kernels run --sizes 1KB,64KB,1MB --snrs 4,12
+#   python -m bench.bench_kernels run --kernels 'app.map*,app.demod*' --label vectorized-16qam
+#   python -m bench.bench_kernels list
+#   python -m bench.bench_kernels compare                 # last two runs
+#   python -m bench.bench_kernels compare BASE HEAD --threshold 0.1 --min-delta-ms 0.05
+import argparse, fnmatch, importlib.util, json, os, platform, subprocess, sys, time
+import numpy as np
+
+from app import channel, crypto_utils, pulse_shaping, segments
+from app.ml_model import load_model, select_modulation
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY = os.path.join(HERE, "results", "history.jsonl")
+SCHEMES = ("BPSK", "QPSK", "16QAM")
+UNITS = {"B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+MIN_REPS = 5   # every case is timed at least this often; compare flags nothing below it
+
+def _load_udp_common():
+    # adapt_mod_ml uses flat imports (`from common import ...`); load its
+    # common.py by path so it does not collide with app.common
+    path = os.path.join(HERE, "..", "..", "adapt_mod_ml", "common.py")
+    spec = importlib.util.spec_from_file_location("adapt_mod_ml_common", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+udp = _load_udp_common()
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for unit in ("GB", "MB", "KB", "B"):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * UNITS[unit])
+    return int(text)
+
+def fmt_size(n: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if n >= UNITS[unit] and n % UNITS[unit] == 0:
+            return f"{n // UNITS[unit]}{unit}"
+    return f"{n}B"
+
+# -------------------------------
+# Kernel registry
+# -------------------------------
+# Each kernel: name -> (setup(size, scheme, snr) -> zero-arg callable, axes, max_size)
+#   axes: which of "size", "scheme", "snr" the kernel is parameterized over
+#   max_size: largest payload that finishes in reasonable time/memory
+#             (pure-Python loops); bigger sizes are recorded as skipped
+KERNELS = {}
+
+def kernel(name, axes=("size",), max_size=None):
+    def deco(fn):
+        KERNELS[name] = (fn, axes, max_size)
+        return fn
+    return deco
+
+def _payload(size: int) -> bytes:
+    return np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def _bits(size: int, multiple: int = 4) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(_payload(size), dtype=np.uint8))
+    return bits[:len(bits) // multiple * multiple]
+
+# ---- adapt_mod_ml/common.py (UDP demo) ----
+@kernel("udp.mod", ("size", "scheme"), max_size=4 << 20)
+def _udp_mod(size, scheme, snr):
+    mod, _, _ = udp.MOD_SCHEMES[scheme]
+    bits = _bits(size)
+    return lambda: mod(bits)
+
+@kernel("udp.demod", ("size", "scheme"), max_size=4 << 20)
+def _udp_demod(size, scheme, snr):
+    mod, demod, _ = udp.MOD_SCHEMES[scheme]
+    syms = mod(_bits(size))
+    return lambda: demod(syms)
+
+@kernel("udp.add_awgn", ("size", "scheme", "snr"), max_size=16 << 20)
+def _udp_awgn(size, scheme, snr):
+    mod, _, k = udp.MOD_SCHEMES[scheme]
+    syms = mod(_bits(size)) if size <= 4 << 20 else np.ones(size*8 // k, complex)
+    return lambda: udp.add_awgn(syms, snr, k)
+
+# ---- app/channel.py ----
+@kernel("app.map", ("size", "scheme"), max_size=4 << 20)
+def _map(size, scheme, snr):
+    bits = _bits(size)
+    return lambda: channel.bits_to_constellation(bits, scheme)
+
+@kernel("app.demod", ("size", "scheme"), max_size=16 << 20)
+def _demod(size, scheme, snr):
+    k = {"BPSK": 1, "QPSK": 2, "16QAM": 4}[scheme]
+    I = np.random.default_rng(1).standard_normal(size*8 // k)
+    Q = np.random.default_rng(2).standard_normal(size*8 // k)
+    return lambda: channel.demodulate_bits(I, Q, scheme)
+
+@kernel("app.add_awgn", ("size", "snr"), max_size=16 << 20)
+def _awgn(size, scheme, snr):
+    I = np.ones(size*8 // 2)
+    Q = np.ones(size*8 // 2)
+    return lambda: channel.add_awgn(I, Q, snr)
+
+@kernel("app.waveform_channel", ("size", "snr"), max_size=4 << 20)
+def _waveform(size, scheme, snr):
+    I = np.ones(size*8 // 2) / np.sqrt(2)
+    Q = -I
+    return lambda: pulse_shaping.waveform_channel(I, Q, snr)
+
+@kernel("app.rep3_encode", ("size",), max_size=64 << 20)
+def _rep3_enc(size, scheme, snr):
+    data = _payload(size)
+    return lambda: channel.rep3_encode(data)
+
+@kernel("app.rep3_decode", ("size",), max_size=64 << 20)
+def _rep3_dec(size, scheme, snr):
+    enc = channel.rep3_encode(_payload(size))
+    return lambda: channel.rep3_decode(enc)
+
+@kernel("app.flip_bits", ("size", "snr"), max_size=64 << 10)
+def _flip(size, scheme, snr):
+    data = _payload(size)
+    ber = channel.ber_for_scheme(snr, "QPSK")
+    return lambda: channel.flip_bits(data, ber)
+
+# ---- app/crypto_utils.py ----
+@kernel("crypto.derive_key", ())
+def _kdf(size, scheme, snr):
+    salt = crypto_utils.new_salt()
+    return lambda: crypto_utils.derive_key("benchmark", salt)
+
+@kernel("crypto.encrypt_with_key", ("size",), max_size=64 << 20)
+def _enc(size, scheme, snr):
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+    data = _payload(size)
+    return lambda: crypto_utils.encrypt_with_key(data, key)
+
+@kernel("crypto.decrypt_with_key", ("size",), max_size=64 << 20)
+def _dec(size, scheme, snr):
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+    iv, ct = crypto_utils.encrypt_with_key(_payload(size), key)
+    return lambda: crypto_utils.decrypt_with_key(ct, key, iv)
+
+# ---- app/segments.py (thread pool size: PIPELINE_THREADS env) ----
+@kernel("segments.seal", ("size",), max_size=64 << 20)
+def _seal(size, scheme, snr):
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+    data = _payload(size)
+    return lambda: segments.seal(data, key)
+
+@kernel("segments.open_encoded", ("size",), max_size=64 << 20)
+def _open(size, scheme, snr):
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+    iv, _, fec_ct = segments.seal(_payload(size), key)
+    return lambda: segments.open_encoded(fec_ct, key, iv, segments.SEGMENT_SIZE)
+
+@kernel("macro.encrypt_fec_monolithic", ("size",), max_size=64 << 20)
+def _mono(size, scheme, snr):
+    # the one-shot path seal() replaces for large payloads
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+    data = _payload(size)
+    return lambda: channel.rep3_encode(crypto_utils.encrypt_with_key(data, key)[1])
+
+# ---- app/ml_model.py ----
+_model = None
+
+@kernel("ml.select_modulation", ("snr",))
+def _select(size, scheme, snr):
+    global _model
+    if _model is None:
+        _model = load_model()
+    return lambda: select_modulation(_model, snr, 20, 3, 1e-3)
+
+# ---- macro: full server TX + RX chain minus the websocket ----
+@kernel("macro.tx_rx_pipeline", ("size", "scheme", "snr"), max_size=1 << 20)
+def _pipeline(size, scheme, snr):
+    data = _payload(size)
+    key = crypto_utils.derive_key("benchmark", crypto_utils.new_salt())
+
+    def run():
+        iv, ct = crypto_utils.encrypt_with_key(data, key)
+        fec_ct = channel.rep3_encode(ct)
+        I, Q = channel.bits_to_constellation(channel.bytes_to_bits(fec_ct), scheme)
+        I, Q = pulse_shaping.waveform_channel(I, Q, snr)
+        noisy = np.packbits(channel.demodulate_bits(I, Q, scheme)).tobytes()
+        return crypto_utils.decrypt_with_key(channel.rep3_decode(noisy), key, iv)
+    return run
+
+# -------------------------------
+# Runner
+# -------------------------------
+def time_it(fn, min_time: float, max_reps: int):
+    fn()  # warm-up (allocations, lazy imports, caches)
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_reps and (len(times) < MIN_REPS or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+def _cases(name, sizes, schemes, snrs):
+    _, axes, _ = KERNELS[name]
+    for size in (sizes if "size" in axes else [0]):
+        for scheme in (schemes if "scheme" in axes else ["-"]):
+            for snr in (snrs if "snr" in axes else [None]):
+                yield size, scheme, snr
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run(args):
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    schemes = args.schemes.split(",")
+    snrs = [float(s) for s in args.snrs.split(",")]
+    names = [n for n in KERNELS if any(fnmatch.fnmatch(n, pat) for pat in args.kernels.split(","))]
+
+    results = []
+    print(f"{'kernel':<26} {'size':>6} {'scheme':>6} {'snr':>5} {'median ms':>11} {'min ms':>9} {'MB/s':>9} {'reps':>5}")
+    for name in names:
+        setup, axes, max_size = KERNELS[name]
+        for size, scheme, snr in _cases(name, sizes, schemes, snrs):
+            rec = {"kernel": name, "size": size, "scheme": scheme, "snr": snr}
+            if max_size is not None and size > max_size:
+                rec["skipped"] = f"size > {fmt_size(max_size)}"
+                results.append(rec)
+                print(f"{name:<26} {fmt_size(size):>6} {scheme:>6} {'-' if snr is None else snr:>5}   skipped ({rec['skipped']})")
+                continue
+            times = time_it(setup(size, scheme, snr if snr is not None else 8.0), args.min_time, args.max_reps)
+            med = float(np.median(times))
+            rec.update(median_s=med, min_s=float(min(times)), reps=len(times),
+                       mbps=(size / med / 1e6) if size else None)
+            results.append(rec)
+            print(f"{name:<26} {fmt_size(size) if size else '-':>6} {scheme:>6} {'-' if snr is None else snr:>5} "
+                  f"{med*1e3:>11.3f} {min(times)*1e3:>9.3f} {rec['mbps'] or 0:>9.1f} {len(times):>5}")
+
+    entry = {
+        "run_id": time.strftime("%Y%m%d-%H%M%S"),
+        "label": args.label,
+        "git_rev": _git_rev(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"\nrecorded run {entry['run_id']} -> {args.history}")
+
+# -------------------------------
+# History / comparison
+# -------------------------------
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _find(runs, ref):
+    # by run_id, label, or negative index (-1 = latest)
+    for r in reversed(runs):
+        if ref in (r["run_id"], r.get("label")):
+            return r
+    try:
+        return runs[int(ref)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"no run matching {ref!r}")
+
+def compare(args):
+    runs = load_history(args.history)
+    if len(runs) < 2 and not (args.base and args.head):
+        raise SystemExit("need at least two recorded runs")
+    base = _find(runs, args.base or "-2")
+    head = _find(runs, args.head or "-1")
+    key = lambda r: (r["kernel"], r["size"], r["scheme"], r["snr"])
+    base_by = {key(r): r for r in base["results"] if "median_s" in r}
+
+    print(f"base {base['run_id']} ({base.get('label') or base.get('git_rev')})  ->  "
+          f"head {head['run_id']} ({head.get('label') or head.get('git_rev')})   threshold ±{args.threshold:.0%}, "
+          f">= {args.min_delta_ms} ms, >= {args.min_reps} reps")
+    print(f"{'kernel':<26} {'size':>6} {'scheme':>6} {'snr':>5} {'base ms':>10} {'head ms':>10} {'ratio':>7}")
+    regressions = 0
+    for r in head["results"]:
+        b = base_by.get(key(r))
+        if b is None or "median_s" not in r:
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        # a relative change alone is noise on sub-ms kernels or thin samples
+        delta_ms = abs(r["median_s"] - b["median_s"]) * 1e3
+        reps = min(r.get("reps", 0), b.get("reps", 0))
+        flag = ""
+        if abs(ratio - 1) <= args.threshold:
+            pass
+        elif delta_ms < args.min_delta_ms:
+            flag = "  (below min delta)"
+        elif reps < args.min_reps:
+            flag = f"  (only {reps} reps)"
+        elif ratio > 1:
+            flag, regressions = "  REGRESSION", regressions + 1
+        else:
+            flag = "  faster"
+        size = fmt_size(r["size"]) if r["size"] else "-"
+        snr = "-" if r["snr"] is None else r["snr"]
+        print(f"{r['kernel']:<26} {size:>6} {r['scheme']:>6} {snr:>5} "
+              f"{b['median_s']*1e3:>10.3f} {r['median_s']*1e3:>10.3f} {ratio:>6.2f}x{flag}")
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def list_runs(args):
+    for r in load_history(args.history):
+        n = sum(1 for x in r["results"] if "median_s" in x)
+        print(f"{r['run_id']}  {r.get('label') or '':<20} rev={r.get('git_rev')}  {n} results")
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DSP/FEC/crypto kernel benchmarks")
+    p.add_argument("--history", default=HISTORY)
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="run benchmarks and append to history")
+    r.add_argument("--kernels", default="*", help="comma-separated glob patterns")
+    r.add_argument("--sizes", default="1KB,64KB,1MB", help="payload sizes, 1KB .. 64MB")
+    r.add_argument("--schemes", default=",".join(SCHEMES))
+    r.add_argument("--snrs", default="4,12", help="SNR values in dB")
+    r.add_argument("--min-time", type=float, default=0.2, help="seconds of timing per case")
+    r.add_argument("--max-reps", type=int, default=50)
+    r.add_argument("--label", default=None)
+
+    c = sub.add_parser("compare", help="compare two recorded runs")
+    c.add_argument("base", nargs="?", help="run_id, label or index (default: second latest)")
+    c.add_argument("head", nargs="?", help="run_id, label or index (default: latest)")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative slowdown flagged as regression")
+    c.add_argument("--min-delta-ms", type=float, default=0.05,
+                   help="absolute median change below which nothing is flagged")
+    c.add_argument("--min-reps", type=int, default=MIN_REPS, help="repetitions both runs need before flagging")
+
+    sub.add_parser("list", help="list recorded runs")
+
+    args = p.parse_args(argv)
+    if args.cmd == "run":
+        run(args)
+    elif args.cmd == "compare":
+        sys.exit(compare(args))
+    else:
+        list_runs(args)
+
+if __name__ == "__main__":
+    main()
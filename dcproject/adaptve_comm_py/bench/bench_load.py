@@ -0,0 +1,298 @@
+# bench/bench_load.py
+# Load generator for /ws: N rooms, each with one TX page and R RX pages,
+# speaking the same messages as main.js (join, set_snr, send_text,
+# send_file, rx_decrypt, optionally previews/get_preview).
+#
+# Each TX sends at a fixed rate with a weighted mix of message kinds. Every
+# payload starts with a "room:seq|" marker, so when an RX gets its rx_result
+# the send time can be looked up and two latencies recorded:
+#   frame   TX send -> frame_rx at the RX page
+#   e2e     TX send -> rx_result (after the RX page's rx_decrypt round trip)
+#
+# --rooms takes a list to step the offered load and find where one worker
+# saturates (delivered rate stops tracking the offered rate, p99 takes off).
+#
+# Run from adaptve_comm_py/:
+#   python -m bench.bench_load                                  # uvicorn subprocess
+#   python -m bench.bench_load --rooms 1,2,4,8,16 --rx 2 --rate 5
+#   python -m bench.bench_load --mix text=1,file=1 --file-bytes 4KB,256KB
+#   python -m bench.bench_load --target inproc                  # same process/loop
+#   python -m bench.bench_load --target ws://127.0.0.1:8000/ws  # running server
+#
+# --target inproc runs uvicorn in the benchmark's own event loop: convenient
+# under a debugger/profiler, but clients and server then share one GIL, so
+# the numbers are a lower bound. Per-connection limits (app/limits.py,
+# 20 msgs/s) apply to each simulated page: keep --rate below that.
+import argparse, asyncio, base64, json, os, random, subprocess, sys, tempfile, time
+from collections import Counter, deque
+import numpy as np
+
+from bench.bench_fanout import _free_port, _join, start_server
+from bench.bench_kernels import fmt_size, parse_size
+
+PASSWORD = "bench"
+
+class Stats:
+    def __init__(self):
+        self.sent = Counter()        # by kind
+        self.sent_bytes = 0
+        self.frame = []              # seconds, TX send -> frame_rx
+        self.e2e = []                # seconds, TX send -> rx_result
+        self.ack = []                # seconds, TX send -> tx_ack
+        self.results = 0             # rx_result ok, marker matched
+        self.delivered_bytes = 0
+        self.last_result = 0.0
+        self.decrypt_failed = 0      # rx_result ok=False (channel errors beyond FEC)
+        self.corrupt = 0             # decrypted but marker unreadable
+        self.rate_limited = 0        # "error" replies from the server
+        self.previews = 0
+
+def _pct(a, q):
+    return 1e3*float(np.percentile(a, q)) if a else float("nan")
+
+def _payloads(args):
+    # random file bodies made once per size; markers are spliced in per send
+    rng = np.random.default_rng(0)
+    return {n: rng.integers(0, 256, n, dtype=np.uint8).tobytes() for n in args.file_sizes}
+
+async def tx_client(url, room, args, stats, sent_at, blocks, stop_at, rng):
+    ws = await _join(url, room, "tx")
+    await ws.send(json.dumps({"type": "set_snr", "snr": args.snr}))
+    acks = deque()
+
+    async def reader():
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg["type"] == "tx_ack" and acks:
+                stats.ack.append(time.perf_counter() - acks.popleft())
+            elif msg["type"] == "error":
+                # a refused send gets an error instead of its tx_ack
+                stats.rate_limited += 1
+                if acks:
+                    acks.popleft()
+    read_task = asyncio.create_task(reader())
+
+    kinds, weights = zip(*args.mix.items())
+    interval = 1.0 / args.rate
+    next_t = time.perf_counter() + rng.uniform(0, interval)   # stagger the rooms
+    seq = 0
+    while next_t < stop_at:
+        await asyncio.sleep(max(0.0, next_t - time.perf_counter()))
+        next_t += interval
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "snr":
+            await ws.send(json.dumps({"type": "set_snr", "snr": args.snr}))
+            stats.sent[kind] += 1
+            continue
+        marker = f"{room}:{seq}|"
+        if kind == "text":
+            text = marker + "x"*max(0, args.text_bytes - len(marker))
+            msg = {"type": "send_text", "text": text, "password": PASSWORD}
+            nbytes = len(text)
+        else:
+            block = blocks[rng.choice(args.file_sizes)]
+            body = marker.encode() + block[len(marker):]
+            msg = {"type": "send_file", "name": f"load-{seq}.bin", "password": PASSWORD,
+                   "content_b64": base64.b64encode(body).decode()}
+            nbytes = len(body)
+        t0 = time.perf_counter()
+        sent_at[marker] = t0
+        acks.append(t0)
+        await ws.send(json.dumps(msg))
+        stats.sent[kind] += 1
+        stats.sent_bytes += nbytes
+        seq += 1
+    return ws, read_task
+
+async def rx_client(url, room, args, stats, sent_at):
+    ws = await _join(url, room, "rx")
+    if args.previews:
+        await ws.send(json.dumps({"type": "previews", "on": True}))
+    # frame_rx arrival times, in the order their rx_decrypt replies come back
+    pending = deque()
+
+    async def loop():
+        async for raw in ws:
+            t = time.perf_counter()
+            msg = json.loads(raw)
+            typ = msg["type"]
+            if typ == "frame_rx":
+                pending.append(t)
+                await ws.send(json.dumps({
+                    "type": "rx_decrypt", "password": PASSWORD, "kind": msg["kind"],
+                    "scheme": msg["scheme"], "iv": msg["iv"], "salt": msg["salt"],
+                    "cipher": msg["cipher"], "fec": msg.get("fec"), "seg": msg.get("seg"),
+                }))
+                if args.previews and msg.get("frame_id"):
+                    await ws.send(json.dumps({"type": "get_preview", "frame_id": msg["frame_id"]}))
+            elif typ == "rx_result":
+                t_frame = pending.popleft()
+                if not msg["ok"]:
+                    stats.decrypt_failed += 1
+                    continue
+                if msg["kind"] == "text":
+                    head = msg["text"][:80]
+                    nbytes = len(msg["text"])
+                else:
+                    head = base64.b64decode(msg["file_b64"][:108]).decode("latin-1")
+                    nbytes = len(msg["file_b64"]) * 3 // 4
+                t0 = sent_at.get(head.split("|", 1)[0] + "|")
+                if t0 is None:
+                    stats.corrupt += 1
+                    continue
+                stats.frame.append(t_frame - t0)
+                stats.e2e.append(t - t0)
+                stats.results += 1
+                stats.delivered_bytes += nbytes
+                stats.last_result = t
+            elif typ == "frame_artifacts":
+                stats.previews += 1
+            elif typ == "error":
+                stats.rate_limited += 1
+                if pending and not args.previews:
+                    pending.popleft()   # that rx_decrypt was dropped
+    return ws, asyncio.create_task(loop())
+
+async def run_step(url, n_rooms, args):
+    stats = Stats()
+    sent_at = {}
+    blocks = _payloads(args)
+    tag = f"load-{time.time_ns():x}"
+    rooms = [f"{tag}-{i}" for i in range(n_rooms)]
+
+    rx = [await rx_client(url, room, args, stats, sent_at) for room in rooms for _ in range(args.rx)]
+    start = time.perf_counter()
+    stop_at = start + args.duration
+    txs = await asyncio.gather(*[
+        tx_client(url, room, args, stats, sent_at, blocks, stop_at, random.Random(i))
+        for i, room in enumerate(rooms)])
+    send_done = time.perf_counter()
+
+    # drain: wait until every expected rx_result is in, or give up
+    expected = lambda: (sum(stats.sent[k] for k in ("text", "file")) * args.rx
+                        - stats.decrypt_failed - stats.corrupt - stats.rate_limited)
+    deadline = send_done + args.drain
+    while stats.results < expected() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = max(stats.last_result, send_done) - start
+
+    for ws, task in [*rx, *txs]:
+        task.cancel()
+        await ws.close()
+
+    return {
+        "rooms": n_rooms, "rx_per_room": args.rx, "duration_s": args.duration,
+        "offered_msgs_s": n_rooms * args.rate,
+        "sent": dict(stats.sent),
+        "sent_msgs_s": sum(stats.sent.values()) / args.duration,
+        "delivered_s": stats.results / elapsed,
+        "delivered_mb_s": stats.delivered_bytes / elapsed / 1e6,
+        "missing": max(0, expected() - stats.results),
+        "decrypt_failed": stats.decrypt_failed, "corrupt": stats.corrupt,
+        "rate_limited": stats.rate_limited, "previews": stats.previews,
+        **{f"{name}_p{q}_ms": _pct(vals, q)
+           for name, vals in (("frame", stats.frame), ("e2e", stats.e2e), ("ack", stats.ack))
+           for q in (50, 95, 99)},
+    }
+
+def _print_header():
+    print(f"{'rooms':>5} {'offered/s':>9} {'sent/s':>7} {'deliv/s':>8} {'MB/s':>6} {'miss':>5} {'fail':>5} {'rl':>4} "
+          f"{'frame p50':>9} {'p95':>7} {'p99':>7} {'e2e p50':>8} {'p95':>7} {'p99':>7} {'ack p50':>8}  (ms)")
+
+def _print_row(r):
+    print(f"{r['rooms']:>5} {r['offered_msgs_s']:>9.1f} {r['sent_msgs_s']:>7.1f} {r['delivered_s']:>8.1f} "
+          f"{r['delivered_mb_s']:>6.2f} {r['missing']:>5} {r['decrypt_failed'] + r['corrupt']:>5} {r['rate_limited']:>4} "
+          f"{r['frame_p50_ms']:>9.1f} {r['frame_p95_ms']:>7.1f} {r['frame_p99_ms']:>7.1f} "
+          f"{r['e2e_p50_ms']:>8.1f} {r['e2e_p95_ms']:>7.1f} {r['e2e_p99_ms']:>7.1f} {r['ack_p50_ms']:>8.1f}")
+
+async def main_async(url, args):
+    print(f"target {url}  rx/room={args.rx}  rate={args.rate}/s per TX  mix={args.mix}  "
+          f"text={args.text_bytes}B  file={','.join(fmt_size(n) for n in args.file_sizes)}  snr={args.snr}dB")
+    _print_header()
+    results = []
+    for n_rooms in args.rooms:
+        r = await run_step(url, n_rooms, args)
+        results.append(r)
+        _print_row(r)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"target": url, "args": {k: v for k, v in vars(args).items() if k != "json"},
+                       "steps": results}, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+async def inproc_async(args):
+    import uvicorn
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config("app.server:app", host="127.0.0.1", port=port,
+                                           log_level="warning", ws_per_message_deflate=False))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        await main_async(f"ws://127.0.0.1:{port}/ws", args)
+    finally:
+        server.should_exit = True
+        await serve
+
+def _mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, w = part.partition("=")
+        if kind not in ("text", "file", "snr"):
+            raise argparse.ArgumentTypeError(f"unknown message kind {kind!r} (text, file, snr)")
+        mix[kind] = float(w or 1)
+    return mix
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="WebSocket load generator for /ws")
+    p.add_argument("--target", default="uvicorn",
+                   help="'uvicorn' (subprocess), 'inproc', or a ws:// URL of a running server")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    p.add_argument("--rooms", default="1,4,16", help="comma-separated room counts, one step each")
+    p.add_argument("--rx", type=int, default=1, help="RX pages per room")
+    p.add_argument("--rate", type=float, default=5.0, help="messages/s per TX page")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds of sending per step")
+    p.add_argument("--drain", type=float, default=10.0, help="seconds to wait for stragglers")
+    p.add_argument("--mix", type=_mix, default=_mix("text=8,file=1,snr=1"),
+                   help="weighted message kinds, e.g. text=8,file=1,snr=1")
+    p.add_argument("--text-bytes", type=int, default=256)
+    p.add_argument("--file-bytes", default="64KB", help="comma-separated sizes, picked at random")
+    p.add_argument("--snr", type=float, default=20.0,
+                   help="room SNR in dB; low values make rx_decrypt fail, which is counted, not timed")
+    p.add_argument("--previews", action="store_true", help="RX pages request chart previews too")
+    p.add_argument("--json", default=None, help="also write results to this file")
+    args = p.parse_args(argv)
+    args.rooms = [int(n) for n in args.rooms.split(",")]
+    args.file_sizes = [parse_size(s) for s in args.file_bytes.split(",")]
+    if args.rate > 20:
+        print("warning: --rate above the 20 msgs/s per-connection limit; expect rate-limit errors",
+              file=sys.stderr)
+
+    if args.target == "inproc":
+        asyncio.run(inproc_async(args))
+    elif args.target == "uvicorn":
+        hub, env = None, None
+        if args.workers > 1:
+            # rooms span workers: share them through a private hub
+            sock = os.path.join(tempfile.mkdtemp(), "rooms.sock")
+            hub = subprocess.Popen([sys.executable, "-m", "app.hub", sock])
+            while not os.path.exists(sock):
+                time.sleep(0.05)
+            env = {"ROOM_BACKEND": "hub", "ROOM_HUB_SOCKET": sock}
+        port = _free_port()
+        proc = start_server(port, args.workers, env)
+        try:
+            if args.workers > 1:
+                time.sleep(1.0)  # let every worker finish startup
+            asyncio.run(main_async(f"ws://127.0.0.1:{port}/ws", args))
+        finally:
+            proc.terminate()
+            proc.wait()
+            if hub:
+                hub.terminate()
+                hub.wait()
+    else:
+        asyncio.run(main_async(args.target, args))
+
+if __name__ == "__main__":
+    main()
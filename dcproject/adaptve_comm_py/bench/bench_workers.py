@@ -0,0 +1,52 @@
+# bench/bench_workers.py
+# Concurrent-room throughput vs uvicorn worker count with ROOM_BACKEND=hub.
+# TX and RX sockets of a room usually land on different workers, so every
+# frame_rx / peer_status / snr_update crosses the hub.
+# Run from adaptve_comm_py/:  python -m bench.bench_workers
+import asyncio, json, os, subprocess, sys, tempfile, time
+
+from bench.bench_fanout import _free_port, _join, _next_of, start_server
+
+async def _room(url, idx, n_msgs):
+    room = f"w-{idx}-{time.time_ns()}"
+    rx = await _join(url, room, "rx")
+    tx = await _join(url, room, "tx")
+    await tx.send(json.dumps({"type": "set_snr", "snr": 12}))
+    await _next_of(rx, "snr_update")
+    for i in range(n_msgs):
+        await tx.send(json.dumps({"type": "send_text", "text": f"room {idx} msg {i}", "password": "bench"}))
+        await _next_of(rx, "frame_rx")
+    await rx.close()
+    await tx.close()
+
+async def run_case(url, n_rooms, n_msgs):
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_room(url, i, n_msgs) for i in range(n_rooms)])
+    return n_rooms*n_msgs / (time.perf_counter() - t0)
+
+def main():
+    n_rooms, n_msgs = 32, 10
+    sock = os.path.join(tempfile.mkdtemp(), "rooms.sock")
+    hub = subprocess.Popen([sys.executable, "-m", "app.hub", sock])
+    while not os.path.exists(sock):
+        time.sleep(0.05)
+    try:
+        print(f"{'workers':>7} {'rooms':>6} {'frames/s':>9}")
+        for workers in (1, 2, 4):
+            if workers > (os.cpu_count() or 1):
+                break
+            port = _free_port()
+            proc = start_server(port, workers, env={"ROOM_BACKEND": "hub", "ROOM_HUB_SOCKET": sock})
+            try:
+                time.sleep(1.0)  # let every worker finish startup
+                rate = asyncio.run(run_case(f"ws://127.0.0.1:{port}/ws", n_rooms, n_msgs))
+                print(f"{workers:>7} {n_rooms:>6} {rate:>9.1f}")
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        hub.terminate()
+        hub.wait()
+
+if __name__ == "__main__":
+    main()